@@ -1,9 +1,15 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Response
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 import uuid
-from typing import Dict, Optional
+import json
+import html
+import asyncio
+import datetime
+from urllib.parse import urlencode
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import os
 from dotenv import load_dotenv
 
@@ -18,17 +24,32 @@ from main import (
     extraer_nombre_dj,
     recopilar_datos_evento,
     finalizar_contratacion,
-    verificar_disponibilidad,
-    buscar_en_texto
+    buscar_en_texto,
+    indice_de_texto,
+    motor_de_precios,
+    preparar_consulta_disponibilidad,
+    matriz_disponibilidad,
+    extraer_consulta_presupuesto,
+    responder_presupuesto,
+    responder_rangos_precio,
+    MENSAJE_SIN_TARIFA
 )
+from catalog import DJCatalog, normalizar
+from fechas import parsear_fecha, rango_fechas
+from bookings_repository import bookings, COLUMNAS_EXPORTACION
+from exports import EXPORTADORES, FORMATOS
+from keywords import palabras_clave
+from artist_resolver import artistas
+from session_store import create_session_store, shard_for, MemorySessionStore
 
 # Importar OpenAI handler
 try:
-    from openai_handler import openai_handler
+    from openai_handler import openai_handler, RESPUESTA_INTERRUMPIDA
     OPENAI_ENABLED = openai_handler is not None
 except ImportError:
     OPENAI_ENABLED = False
     openai_handler = None
+    RESPUESTA_INTERRUMPIDA = ""
 
 app = FastAPI(title="Funndication DJ Bookings API", version="1.0.0")
 
@@ -45,18 +66,25 @@ class MessageResponse(BaseModel):
     session_id: str
     status: str = "active"  # active, completed, error
 
-# Almacenamiento en memoria de sesiones (en producción usar Redis/DB)
-sessions: Dict[str, Dict] = {}
+# Categorías de palabras clave que llevan a mostrar la lista de DJs
+CATEGORIAS_BOOKING = {"contratar", "peticion", "evento", "precio", "disponibilidad"}
+
+# Almacén de sesiones con caducidad por inactividad (SESSION_BACKEND=memory|sqlite)
+sessions = create_session_store()
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+# Enrutado "sticky": nº de particiones que se anuncian al proxy (0 = deshabilitado)
+SESSION_STICKY_SHARDS = int(os.getenv("SESSION_STICKY_SHARDS", "0"))
 
 # Cargar datos al iniciar
 pdfs_data = {}
 djs_database = ""
 prompt_instrucciones = ""
+dj_catalog = DJCatalog.from_text("")
 
 @app.on_event("startup")
 async def startup_event():
     """Inicializar la aplicación al arrancar"""
-    global pdfs_data, djs_database, prompt_instrucciones
+    global pdfs_data, djs_database, prompt_instrucciones, dj_catalog
     
     print("Iniciando Funndication DJ Bookings API...")
     
@@ -79,6 +107,22 @@ async def startup_event():
             djs_database = contenido
             print(f"[DATA] Base de datos DJs cargada desde: {nombre}")
     
+    # Parsear el catálogo de DJs y construir el índice de búsqueda una sola vez
+    dj_catalog = DJCatalog.from_text(djs_database)
+    indice_de_texto(djs_database)
+    pricing = motor_de_precios(djs_database)
+    palabras_clave.registrar_artistas(dj_catalog)
+    artistas.registrar_artistas(dj_catalog)
+    print(f"[OK] Catálogo de DJs: {len(dj_catalog)} artistas")
+    if OPENAI_ENABLED:
+        openai_handler.set_catalog(dj_catalog, pricing)
+    
+    if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 and isinstance(sessions, MemorySessionStore):
+        print("[WARNING] Varios workers con sesiones en memoria: usa SESSION_BACKEND=sqlite")
+    
+    # Barrido periódico de sesiones abandonadas
+    asyncio.get_event_loop().create_task(sweep_sessions())
+    
     print("[OK] Sistema listo para recibir requests")
     
     # Verificar estado de OpenAI
@@ -88,21 +132,54 @@ async def startup_event():
         print("[INFO] OpenAI no configurado - Funcionando con lógica de palabras clave")
         print("[INFO] Para habilitar OpenAI, configura OPENAI_API_KEY en .env")
 
-def create_session() -> str:
-    """Crear nueva sesión"""
-    session_id = str(uuid.uuid4())
-    sessions[session_id] = {
+async def sweep_sessions():
+    """Elimina periódicamente las sesiones caducadas"""
+    loop = asyncio.get_event_loop()
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+        try:
+            eliminadas = await loop.run_in_executor(None, sessions.sweep)
+            if eliminadas:
+                print(f"[INFO] Sesiones caducadas eliminadas: {eliminadas}")
+        except Exception as e:
+            print(f"Error barriendo sesiones: {e}")
+
+def new_session_data() -> Dict:
+    return {
         "dj_seleccionado": None,
         "datos_evento": {},
         "estado": "inicial"  # inicial, seleccionando_dj, recopilando_datos, finalizado
     }
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Cerrar las conexiones a la base de datos al apagar"""
+    bookings.close()
+
+async def create_session() -> str:
+    """Crear nueva sesión"""
+    session_id = str(uuid.uuid4())
+    await sessions.set_async(session_id, new_session_data())
     return session_id
 
-def get_session(session_id: str) -> Dict:
-    """Obtener sesión existente"""
-    if session_id not in sessions:
-        session_id = create_session()
-    return sessions[session_id]
+async def get_session(session_id: str) -> Dict:
+    """Obtener sesión existente (o una nueva con el mismo id si ha caducado)"""
+    session = await sessions.get_async(session_id)
+    if session is None:
+        session = new_session_data()
+        await sessions.set_async(session_id, session)
+    return session
+
+async def save_session(session_id: str, session: Dict) -> None:
+    """Persistir los cambios de la sesión tras procesar un mensaje"""
+    await sessions.set_async(session_id, session)
+
+def mark_session_shard(http_response: Response, session_id: str) -> None:
+    """Anuncia la partición de la sesión para que el proxy enrute siempre al mismo worker"""
+    if SESSION_STICKY_SHARDS > 1:
+        shard = str(shard_for(session_id, SESSION_STICKY_SHARDS))
+        http_response.headers["X-Session-Shard"] = shard
+        http_response.set_cookie("session_shard", shard, httponly=True, samesite="lax")
 
 @app.get("/", response_class=HTMLResponse)
 async def root():
@@ -124,34 +201,44 @@ async def root():
     </html>
     """
 
+async def immediate_response(session_id: str, message: str) -> Optional[MessageResponse]:
+    """Respuestas que no dependen del estado (mensaje vacío o salir)"""
+    if not message:
+        return MessageResponse(
+            response="Por favor, dime en que puedo ayudarte.",
+            session_id=session_id
+        )
+    
+    # Manejar comando salir
+    if message.lower() in ['salir', 'exit', 'quit']:
+        await sessions.delete_async(session_id)
+        return MessageResponse(
+            response="Gracias por tu tiempo y te despido de forma cordial y amigable. Espero que tengas un evento espectacular!",
+            session_id=session_id,
+            status="completed"
+        )
+    
+    return None
+
 @app.post("/chat", response_model=MessageResponse)
-async def chat_endpoint(request: MessageRequest):
+async def chat_endpoint(request: MessageRequest, http_response: Response):
     """Endpoint principal del chat"""
+    session_id = request.session_id
     try:
         # Obtener o crear sesión
-        session_id = request.session_id or create_session()
-        session = get_session(session_id)
+        session_id = session_id or await create_session()
+        session = await get_session(session_id)
+        mark_session_shard(http_response, session_id)
         
         message = request.message.strip()
         
-        if not message:
-            return MessageResponse(
-                response="Por favor, dime en que puedo ayudarte.",
-                session_id=session_id
-            )
-        
-        # Manejar comando salir
-        if message.lower() in ['salir', 'exit', 'quit']:
-            if session_id in sessions:
-                del sessions[session_id]
-            return MessageResponse(
-                response="Gracias por tu tiempo y te despido de forma cordial y amigable. Espero que tengas un evento espectacular!",
-                session_id=session_id,
-                status="completed"
-            )
+        inmediata = await immediate_response(session_id, message)
+        if inmediata:
+            return inmediata
         
         # Procesar mensaje según estado de la sesión
         response = await process_message(session, message)
+        await save_session(session_id, session)
         
         return MessageResponse(
             response=response,
@@ -161,120 +248,179 @@ async def chat_endpoint(request: MessageRequest):
     except Exception as e:
         return MessageResponse(
             response=f"Lo siento, ocurrió un error: {str(e)}",
-            session_id=session_id or create_session(),
+            session_id=session_id or await create_session(),
             status="error"
         )
 
+def sse_event(data: Dict, event: Optional[str] = None) -> str:
+    """Formatea un evento Server-Sent Events"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: MessageRequest):
+    """Chat en streaming (SSE): la respuesta se envía por fragmentos según se genera"""
+    session_id = request.session_id or await create_session()
+    session = await get_session(session_id)
+    message = request.message.strip()
+    
+    async def eventos():
+        yield sse_event({"session_id": session_id}, event="session")
+        status = "active"
+        procesando = False
+        try:
+            inmediata = await immediate_response(session_id, message)
+            if inmediata:
+                status = inmediata.status
+                yield sse_event({"delta": inmediata.response})
+            else:
+                procesando = True
+                async for parte in process_message_stream(session, message):
+                    yield sse_event({"delta": parte})
+        except Exception as e:
+            status = "error"
+            yield sse_event({"delta": f"Lo siento, ocurrió un error: {str(e)}"})
+        finally:
+            # También si el cliente se desconecta a mitad: shield para que la
+            # cancelación de la respuesta no interrumpa el guardado
+            if procesando:
+                await asyncio.shield(save_session(session_id, session))
+        yield sse_event({"session_id": session_id, "status": status}, event="done")
+    
+    streaming = StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    mark_session_shard(streaming, session_id)
+    return streaming
+
 async def process_message(session: Dict, message: str) -> str:
     """Procesar mensaje según el estado de la sesión"""
+    return "".join([parte async for parte in process_message_stream(session, message)])
+
+async def respuesta_openai(session: Dict, message: str) -> AsyncIterator[str]:
+    """Respuesta del estado inicial usando OpenAI (intención, ficha del DJ o respuesta libre)"""
+    # Analizar intención (localmente si es obvia, si no con OpenAI)
+    intent_analysis = await openai_handler.classify_intent_async(message, djs_database)
+    
+    if intent_analysis["intent"] == "greeting":
+        yield handle_general_message(message, djs_database)
+        return
+    
+    if intent_analysis["intent"] == "booking" or intent_analysis["confidence"] > 0.7:
+        session["estado"] = "seleccionando_dj"
+    
+        if intent_analysis["entities"]["dj_mentioned"]:
+            # Si mencionó un DJ específico, ir directamente a la selección
+            dj_name = intent_analysis["entities"]["dj_mentioned"]
+            session["dj_seleccionado"] = dj_name
+            session["estado"] = "recopilando_datos"
+    
+            response = f"¡Excelente elección! Has seleccionado a {dj_name}\n"
+            response += await openai_handler.extract_dj_info_async(dj_name, djs_database) + "\n\n"
+            response += "Para cerrar la contratación necesito los siguientes datos obligatorios:\n"
+            response += "+ Localización del evento\n+ Fecha del evento\n+ Duración de la actuación\n"
+            response += "+ Nombre y apellidos\n+ Teléfono\n+ Correo electrónico\n\n"
+            response += "Empecemos con el primer dato.\nLocalización del evento:"
+            yield response
+            return
+        else:
+            # Mostrar todos los DJs con respuesta inteligente
+            async for delta in openai_handler.generate_response_stream(
+                message, 
+                "Usuario quiere contratar un DJ - mostrar lista completa", 
+                djs_database
+            ):
+                yield delta
+            yield "\n\n" + "=" * 70 + "\n"
+            for bloque in dj_catalog.listing_chunks:
+                yield bloque
+            yield "\n" + "=" * 70 + "\n\n¿Cuál de estos artistas te interesa contratar?"
+            return
+    
+    elif intent_analysis["entities"]["dj_mentioned"]:
+        # Pregunta específica sobre un DJ
+        dj_name = intent_analysis["entities"]["dj_mentioned"]
+        yield await openai_handler.extract_dj_info_async(dj_name, djs_database)
+        return
+    
+    else:
+        # Respuesta general con OpenAI
+        async for delta in openai_handler.generate_response_stream(
+            message, 
+            "Usuario hace pregunta general sobre DJs o servicios", 
+            djs_database
+        ):
+            yield delta
+        return
+
+async def process_message_stream(session: Dict, message: str) -> AsyncIterator[str]:
+    """Procesar mensaje devolviendo la respuesta por fragmentos"""
     
     # Si es el primer mensaje o está en estado inicial
     if session["estado"] == "inicial":
         
+        # Preguntas de precio con localización o duración: presupuesto directo
+        presupuesto = presupuesto_para(message)
+        if presupuesto:
+            session["estado"] = "seleccionando_dj"
+            yield presupuesto
+            return
+        
         # Usar OpenAI si está disponible
         if OPENAI_ENABLED:
+            enviado = False
             try:
-                # Analizar intención con OpenAI
-                intent_analysis = openai_handler.analyze_user_intent(message, djs_database)
-                
-                if intent_analysis["intent"] == "booking" or intent_analysis["confidence"] > 0.7:
-                    session["estado"] = "seleccionando_dj"
-                    
-                    if intent_analysis["entities"]["dj_mentioned"]:
-                        # Si mencionó un DJ específico, ir directamente a la selección
-                        dj_name = intent_analysis["entities"]["dj_mentioned"]
-                        session["dj_seleccionado"] = dj_name
-                        session["estado"] = "recopilando_datos"
-                        
-                        response = f"¡Excelente elección! Has seleccionado a {dj_name}\n"
-                        response += openai_handler.extract_dj_info(dj_name, djs_database) + "\n\n"
-                        response += "Para cerrar la contratación necesito los siguientes datos obligatorios:\n"
-                        response += "+ Localización del evento\n+ Fecha del evento\n+ Duración de la actuación\n"
-                        response += "+ Nombre y apellidos\n+ Teléfono\n+ Correo electrónico\n\n"
-                        response += "Empecemos con el primer dato.\nLocalización del evento:"
-                        return response
-                    else:
-                        # Mostrar todos los DJs con respuesta inteligente
-                        response = openai_handler.generate_response(
-                            message, 
-                            "Usuario quiere contratar un DJ - mostrar lista completa", 
-                            djs_database
-                        )
-                        response += "\n\n" + "=" * 70 + "\n"
-                        response += format_djs_info(djs_database)
-                        response += "\n" + "=" * 70 + "\n\n¿Cuál de estos artistas te interesa contratar?"
-                        return response
-                
-                elif intent_analysis["entities"]["dj_mentioned"]:
-                    # Pregunta específica sobre un DJ
-                    dj_name = intent_analysis["entities"]["dj_mentioned"]
-                    return openai_handler.extract_dj_info(dj_name, djs_database)
-                
-                else:
-                    # Respuesta general con OpenAI
-                    return openai_handler.generate_response(
-                        message, 
-                        "Usuario hace pregunta general sobre DJs o servicios", 
-                        djs_database
-                    )
-                    
+                async for parte in respuesta_openai(session, message):
+                    enviado = True
+                    yield parte
+                return
             except Exception as e:
                 print(f"Error con OpenAI: {e}")
+                if enviado:
+                    # Ya se mandó parte de la respuesta: no mezclar con otra distinta
+                    yield RESPUESTA_INTERRUMPIDA
+                    return
                 # Fallback al sistema original
         
         # Fallback: Sistema original (sin OpenAI)
-        palabras_booking = [
-            "contratar", "booking", "book", "contratación", 
-            "quiero contratar", "me gustaría contratar", "necesito contratar",
-            "busco dj", "busco un dj", "necesito dj", "quiero dj",
-            "reservar", "reserva", "evento", "fiesta", "celebración",
-            "dj para evento", "dj para fiesta", "contratar dj",
-            "precio", "precios", "cuanto cuesta", "tarifas",
-            "disponible", "disponibilidad", "fecha"
-        ]
-        
-        if any(palabra in message.lower() for palabra in palabras_booking):
+        if palabras_clave.categorias(message) & CATEGORIAS_BOOKING:
             session["estado"] = "seleccionando_dj"
             
-            response = "¡Perfecto! Te muestro todos los DJs que tenemos disponibles con toda su informacion:\n"
-            response += "=" * 70 + "\n\n"
+            yield "¡Perfecto! Te muestro todos los DJs que tenemos disponibles con toda su informacion:\n"
+            yield "=" * 70 + "\n\n"
             
             # Mostrar todos los DJs
-            response += format_djs_info(djs_database)
-            
-            response += "\n" + "=" * 70
-            response += "\n\n¿Cual de estos artistas te interesa contratar?"
+            for bloque in dj_catalog.listing_chunks:
+                yield bloque
             
-            return response
+            yield "\n" + "=" * 70 + "\n\n¿Cual de estos artistas te interesa contratar?"
+            return
         else:
             # Respuestas naturales para mensajes comunes
-            return handle_general_message(message, djs_database)
+            yield handle_general_message(message, djs_database)
+            return
     
     # Si está seleccionando DJ
     elif session["estado"] == "seleccionando_dj":
-        # Primero verificar si es una nueva intención de contratación
-        palabras_booking = [
-            "contratar", "booking", "book", "contratación", 
-            "quiero contratar", "me gustaría contratar", "necesito contratar",
-            "busco dj", "busco un dj", "necesito dj", "quiero dj",
-            "reservar", "reserva", "evento", "fiesta", "celebración",
-            "dj para evento", "dj para fiesta", "contratar dj",
-            "precio", "precios", "cuanto cuesta", "tarifas",
-            "disponible", "disponibilidad", "fecha"
-        ]
+        presupuesto = presupuesto_para(message)
+        if presupuesto:
+            yield presupuesto
+            return
         
-        if any(palabra in message.lower() for palabra in palabras_booking):
+        # Primero verificar si es una nueva intención de contratación
+        if palabras_clave.categorias(message) & CATEGORIAS_BOOKING:
             # Usuario quiere contratar, mostrar lista de DJs
-            response = "¡Perfecto! Te muestro todos los DJs que tenemos disponibles con toda su informacion:\n"
-            response += "=" * 70 + "\n\n"
+            yield "¡Perfecto! Te muestro todos los DJs que tenemos disponibles con toda su informacion:\n"
+            yield "=" * 70 + "\n\n"
             
             # Mostrar todos los DJs
-            response += format_djs_info(djs_database)
+            for bloque in dj_catalog.listing_chunks:
+                yield bloque
             
-            response += "\n" + "=" * 70
-            response += "\n\n¿Cual de estos artistas te interesa contratar?"
-            
-            return response
+            yield "\n" + "=" * 70 + "\n\n¿Cual de estos artistas te interesa contratar?"
+            return
         else:
             # Intentar extraer nombre de DJ
             dj_seleccionado = extraer_nombre_dj(message)
@@ -293,26 +439,62 @@ async def process_message(session: Dict, message: str) -> str:
                 response += "Empecemos con el primer dato.\n"
                 response += "Localizacion del evento:"
                 
-                return response
+                yield response
+                return
             else:
-                return "No he reconocido ese artista. Por favor, selecciona uno de la lista anterior."
+                yield "No he reconocido ese artista. Por favor, selecciona uno de la lista anterior."
+                return
     
     # Si está recopilando datos
     elif session["estado"] == "recopilando_datos":
-        resultado = recopilar_datos_evento(session["datos_evento"], message, session["dj_seleccionado"])
+        # Tras perder la fecha al cerrar la contratación solo falta volver a pedirla
+        corrigiendo_fecha = session.get("campo_pendiente") == "fecha"
+        # Sin tarifa al cerrar: los datos están completos, se reintenta con el siguiente mensaje
+        reintentando = session.get("campo_pendiente") == "confirmacion"
         
-        if not resultado:
+        # La disponibilidad se consulta sin bloquear el resto de chats
+        pidiendo_fecha = corrigiendo_fecha or len(session["datos_evento"]) == 1
+        if pidiendo_fecha and not await bookings.is_available(session["dj_seleccionado"], message):
             # Fecha no disponible
-            return f"Lo siento, {session['dj_seleccionado']} no está disponible el {message}. Esa fecha ya está ocupada. Por favor, elige otra fecha."
+            yield f"Lo siento, {session['dj_seleccionado']} no está disponible el {message}. Esa fecha ya está ocupada. Por favor, elige otra fecha."
+            yield await sugerir_alternativas(session["dj_seleccionado"], message)
+            return
+        
+        if reintentando:
+            session.pop("campo_pendiente")
+        elif corrigiendo_fecha:
+            session["datos_evento"]["fecha"] = message
+            session.pop("campo_pendiente")
+        else:
+            recopilar_datos_evento(session["datos_evento"], message)
         
         # Si ya tenemos todos los datos
         if len(session["datos_evento"]) == 6:
-            session["estado"] = "finalizado"
+            # Generar respuesta de finalización (la fecha se reserva de forma atómica al guardar)
+            guardada, response = await finalizar_contratacion_web(
+                session["dj_seleccionado"], session["datos_evento"], djs_database
+            )
             
-            # Generar respuesta de finalización
-            response = finalizar_contratacion_web(session["dj_seleccionado"], session["datos_evento"], djs_database)
+            if guardada:
+                session["estado"] = "finalizado"
+                yield response
+                return
             
-            return response
+            if response is None:
+                # Otra sesión ha cerrado esa fecha mientras se recogían los datos
+                fecha = session["datos_evento"].pop("fecha")
+                session["campo_pendiente"] = "fecha"
+                yield (f"Lo siento, {session['dj_seleccionado']} acaba de ser contratado para el {fecha} "
+                       "mientras completabas los datos. El resto de datos se mantiene.")
+                yield await sugerir_alternativas(session["dj_seleccionado"], fecha)
+                yield "\n\nAhora necesito: Fecha del evento (elige otra fecha)"
+                return
+            
+            # Sin tarifa: no se ha guardado nada y se conservan los datos recogidos
+            session["campo_pendiente"] = "confirmacion"
+            yield response
+            yield "\n\nEscribe cualquier mensaje para volver a intentarlo con los mismos datos."
+            return
         else:
             # Necesitamos más datos
             campos = ["localizacion", "fecha", "duracion", "nombre", "telefono", "email"]
@@ -326,38 +508,49 @@ async def process_message(session: Dict, message: str) -> str:
                 "email": "Correo electronico"
             }
             
-            return f"[OK] {campos[len(session['datos_evento'])-1].capitalize()}: {message}\n\nAhora necesito: {nombres_campos[siguiente_campo]}"
+            yield f"[OK] {campos[len(session['datos_evento'])-1].capitalize()}: {message}\n\nAhora necesito: {nombres_campos[siguiente_campo]}"
+            return
     
     # Estado por defecto
-    return "¿En que puedo ayudarte?"
+    yield "¿En que puedo ayudarte?"
 
-def format_djs_info(database: str) -> str:
-    """Formatear información de DJs para mostrar en web"""
-    lineas = database.split('\n')
-    dj_info = ""
-    resultado = ""
-    
-    for linea in lineas:
-        linea = linea.strip()
-        if linea.startswith("NOMBRE:"):
-            if dj_info:
-                resultado += dj_info + "\n" + "-" * 50 + "\n\n"
-            dj_info = linea + "\n"
-        elif linea and not linea.startswith("CHATBOT") and not linea.startswith("ARTISTAS:") and not linea.startswith("INGRESOS") and not linea.startswith("PRESS"):
-            dj_info += linea + "\n"
+async def sugerir_alternativas(dj: str, fecha_texto: str, dias: int = 7) -> str:
+    """Fechas libres cercanas del mismo DJ y otros DJs libres ese día"""
+    fecha = parsear_fecha(fecha_texto)
+    if fecha is None:
+        return ""
     
-    if dj_info:
-        resultado += dj_info
+    desde = max(fecha - datetime.timedelta(days=dias), datetime.date.today())
+    hasta = fecha + datetime.timedelta(days=dias)
+    if hasta < desde:
+        return ""
+    ocupadas = await bookings.busy_dates([dj], desde, hasta)
+    cercanas = sorted(
+        (dia for dia in rango_fechas(desde, hasta) if dia != fecha and dia not in ocupadas[dj]),
+        key=lambda dia: abs((dia - fecha).days)
+    )[:3]
+    otros = await bookings.free_djs(fecha_texto, [artista.nombre for artista in dj_catalog if artista.clave != normalizar(dj)])
     
-    return resultado
+    response = ""
+    if cercanas:
+        response += f"\n\n{dj} está libre: " + ", ".join(dia.strftime("%d/%m/%Y") for dia in sorted(cercanas))
+    if otros:
+        response += f"\nOtros DJs libres el {fecha.strftime('%d/%m/%Y')}: " + ", ".join(otros)
+    return response
+
+def presupuesto_para(message: str) -> Optional[str]:
+    """Respuesta con el presupuesto de todos (o del DJ mencionado) si el mensaje lo pide"""
+    consulta = extraer_consulta_presupuesto(message)
+    if consulta is None:
+        return None
+    return responder_presupuesto(motor_de_precios(djs_database), consulta)
 
 def handle_general_message(message: str, database: str) -> str:
     """Maneja mensajes generales con respuestas naturales"""
-    message_lower = message.lower().strip()
+    categorias = palabras_clave.categorias(message)
     
     # Saludos
-    saludos = ["hola", "hi", "hello", "buenos días", "buenas tardes", "buenas noches", "hey", "que tal"]
-    if any(saludo in message_lower for saludo in saludos):
+    if "saludo" in categorias:
         return ("¡Hola! Soy tu manager de DJs de Funndication Bookings. 🎵\n\n"
                 "Estoy aquí para ayudarte a contratar el DJ perfecto para tu evento.\n\n"
                 "Puedes decirme:\n"
@@ -368,20 +561,18 @@ def handle_general_message(message: str, database: str) -> str:
                 "¿En qué puedo ayudarte hoy?")
     
     # Despedidas
-    despedidas = ["adiós", "adios", "hasta luego", "bye", "chao", "nos vemos"]
-    if any(despedida in message_lower for despedida in despedidas):
+    if "despedida" in categorias:
         return ("¡Hasta luego! Ha sido un placer ayudarte.\n\n"
                 "Si necesitas contratar algún DJ en el futuro, ya sabes dónde encontrarme. 🎧\n\n"
                 "¡Que tengas un día espectacular!")
     
     # Agradecimientos
-    gracias = ["gracias", "thank you", "thanks", "muchas gracias"]
-    if any(palabra in message_lower for palabra in gracias):
+    if "gracias" in categorias:
         return ("¡De nada! Es un placer ayudarte con tu booking. 😊\n\n"
                 "¿Hay algo más en lo que pueda asistirte?")
     
     # Preguntas sobre el servicio
-    if any(palabra in message_lower for palabra in ["que haces", "qué haces", "quien eres", "quién eres", "servicio"]):
+    if "servicio" in categorias:
         return ("Soy el manager de DJs más especializado de Funndication Bookings. 🎵\n\n"
                 "Me encargo de:\n"
                 "✅ Ayudarte a encontrar el DJ perfecto\n"
@@ -392,7 +583,7 @@ def handle_general_message(message: str, database: str) -> str:
                 "¿Te gustaría ver nuestros artistas disponibles?")
     
     # Preguntas sobre géneros musicales
-    if any(palabra in message_lower for palabra in ["música", "genero", "género", "estilo", "break beat", "breakbeat"]):
+    if "estilo" in categorias:
         return ("¡Excelente pregunta! Nuestros DJs se especializan en Break Beat. 🎵\n\n"
                 "Es un género electrónico con ritmos únicos y energia increíble, "
                 "perfecto para cualquier tipo de evento.\n\n"
@@ -405,18 +596,8 @@ def handle_general_message(message: str, database: str) -> str:
                 "¿Te gustaría conocer más sobre alguno en particular?")
     
     # Preguntas sobre precios generales
-    if any(palabra in message_lower for palabra in ["caro", "barato", "económico", "presupuesto", "cuanto"]):
-        return ("Te explico nuestros rangos de precios: 💰\n\n"
-                "🎵 **Opciones más económicas:**\n"
-                "• V. Aparicio: desde 600€\n"
-                "• Wardian: desde 600€\n\n"
-                "🎵 **Rango medio:**\n"
-                "• Jose Rodriguez: desde 1.000€\n"
-                "• Tortu: desde 1.200€\n\n"
-                "🎵 **Premium:**\n"
-                "• The Brainkiller: desde 1.600€\n\n"
-                "Los precios incluyen 1 hora base, +300€ por hora adicional.\n"
-                "¿Te interesa alguno en particular?")
+    if "presupuesto" in categorias:
+        return responder_rangos_precio(motor_de_precios(database))
     
     # Si no reconoce nada, buscar en la base de datos
     informacion = buscar_en_texto(database, message)
@@ -431,10 +612,12 @@ def handle_general_message(message: str, database: str) -> str:
             "• Información sobre nuestros artistas\n\n"
             "¿Podrías decirme qué tipo de ayuda necesitas?")
 
-def finalizar_contratacion_web(dj: str, datos: Dict, database: str) -> str:
-    """Versión web de finalizar_contratacion que retorna string"""
-    from main import guardar_contratacion
-    
+async def finalizar_contratacion_web(dj: str, datos: Dict, database: str) -> Tuple[bool, Optional[str]]:
+    """Versión web de finalizar_contratacion: (guardada, texto para el cliente).
+
+    (False, None) si la fecha ya está ocupada y (False, aviso) si no hay tarifa
+    para el DJ; en ninguno de los dos casos se guarda la contratación.
+    """
     response = f"¡Excelente! He recogido todos los datos para contratar a {dj}\n"
     response += "=" * 50 + "\n"
     response += "RESUMEN DE LA CONTRATACION:\n"
@@ -447,50 +630,16 @@ def finalizar_contratacion_web(dj: str, datos: Dict, database: str) -> str:
     response += f"Email: {datos['email']}\n"
     response += "=" * 50 + "\n\n"
     
-    # Calcular precio (usando la lógica existente)
+    # Calcular precio con las tarifas del PDF de datos
     response += "DESGLOSE DEL PRECIO:\n\n"
     
-    # Precios exactos del PDF
-    precios_djs = {
-        "The Brainkiller": {"base": 1600, "fuera_malaga": 1800, "fuera_espana": 2500},
-        "Jose Rodriguez": {"base": 1000, "fuera_malaga": 1200, "fuera_espana": 1900},
-        "Tortu": {"base": 1200, "fuera_malaga": 1400, "fuera_espana": 2100},
-        "V. Aparicio": {"base": 600, "fuera_malaga": 800, "fuera_espana": 1500},
-        "Wardian": {"base": 600, "fuera_malaga": 800, "fuera_espana": 1500}
-    }
-    
-    precios_dj = precios_djs.get(dj, precios_djs["V. Aparicio"])
-    localizacion = datos['localizacion'].lower()
-    
-    if "málaga" in localizacion or "malaga" in localizacion:
-        precio_base = precios_dj["base"]
-        response += f"Caché base {dj} (Málaga): {precio_base}€\n"
-    elif any(pais in localizacion for pais in ["francia", "portugal", "italia", "alemania", "reino unido", "uk", "france", "germany", "italy"]) or "fuera de españa" in localizacion:
-        precio_base = precios_dj["fuera_espana"]
-        response += f"Caché {dj} fuera de España: {precio_base}€\n"
-        response += "(No incluido hotel, desplazamiento y comida)\n"
-    else:
-        precio_base = precios_dj["fuera_malaga"]
-        response += f"Caché {dj} fuera de Málaga: {precio_base}€\n"
-        response += "(No incluido hotel, desplazamiento y comida)\n"
-    
-    # Calcular horas adicionales
-    import re
-    duracion_texto = datos['duracion'].lower()
-    horas = 1
+    presupuesto = motor_de_precios(database).quote(dj, datos['localizacion'], datos['duracion'])
+    if presupuesto is None:
+        # Sin precio no se guarda nada: la fecha sigue libre
+        return False, response + MENSAJE_SIN_TARIFA.format(dj=dj)
+    response += "".join(linea + "\n" for linea in presupuesto.desglose())
     
-    if 'hora' in duracion_texto:
-        numeros = re.findall(r'\d+', duracion_texto)
-        if numeros:
-            horas = int(numeros[0])
-    
-    precio_horas_extra = 0
-    if horas > 1:
-        horas_extra = horas - 1
-        precio_horas_extra = horas_extra * 300
-        response += f"Horas adicionales ({horas_extra}h x 300€): +{precio_horas_extra}€\n"
-    
-    precio_total = precio_base + precio_horas_extra
+    precio_total = presupuesto.total
     
     response += "-" * 40 + "\n"
     response += f"TOTAL: {precio_total}€\n"
@@ -503,47 +652,70 @@ def finalizar_contratacion_web(dj: str, datos: Dict, database: str) -> str:
     response += "https://www.funndarkbookings/presskits.com\n\n"
     
     # Guardar en base de datos
-    guardar_contratacion(dj, datos, precio_total)
+    if not await bookings.save_booking(dj, datos, precio_total):
+        return False, None
     response += "[OK] Contratación guardada correctamente en el sistema\n\n"
     
     response += f"¡Gracias por confiar en nosotros para tu evento con {dj}!\n"
     response += "¡Que tengas un espectaculo increible!"
     
-    return response
+    return True, response
+
+ADMIN_PAGE_SIZE = int(os.getenv("ADMIN_PAGE_SIZE", "50"))
+ADMIN_MAX_PAGE_SIZE = 200
 
-def get_all_contrataciones():
-    """Obtiene todas las contrataciones de la base de datos"""
-    import sqlite3
+async def get_contrataciones_pagina(filtros: Dict, antes: Optional[int], limite: int):
+    """Una página de contrataciones y los totales de los filtros (calculados en SQLite)"""
     try:
-        conn = sqlite3.connect('contrataciones.db')
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, dj_nombre, cliente_nombre, cliente_telefono, cliente_email,
-                   localizacion, fecha_evento, duracion, precio_total, 
-                   fecha_contratacion, estado
-            FROM contrataciones 
-            ORDER BY fecha_contratacion DESC
-        """)
-        
-        contrataciones = cursor.fetchall()
-        conn.close()
-        
-        # Convertir a lista de diccionarios
-        columns = ['id', 'dj_nombre', 'cliente_nombre', 'cliente_telefono', 'cliente_email',
-                  'localizacion', 'fecha_evento', 'duracion', 'precio_total', 
-                  'fecha_contratacion', 'estado']
-        
-        return [dict(zip(columns, row)) for row in contrataciones]
-        
+        # Se pide una fila de más para saber si hay página siguiente
+        contrataciones = await bookings.list_bookings(antes, limite + 1, **filtros)
+        resumen = await bookings.summarize(**filtros)
+        return contrataciones, resumen
     except Exception as e:
         print(f"Error obteniendo contrataciones: {e}")
-        return []
+        return [], {"total": 0, "ingresos": 0, "djs": 0, "confirmadas": 0}
+
+def filtros_admin(dj: Optional[str], estado: Optional[str], desde: Optional[str], hasta: Optional[str]) -> Dict:
+    """Filtros del panel tal y como los espera el repositorio (400 si una fecha no se reconoce)"""
+    fechas = {}
+    for nombre, valor in (("desde", desde), ("hasta", hasta)):
+        fechas[nombre] = parsear_fecha(valor) if valor else None
+        if valor and fechas[nombre] is None:
+            raise HTTPException(status_code=400, detail=f"Fecha no reconocida en '{nombre}': {valor}")
+    return {"dj": dj or None, "estado": estado or None, **fechas}
 
 @app.get("/admin", response_class=HTMLResponse)
-async def admin_panel():
-    """Panel de administración para ver contrataciones"""
-    contrataciones = get_all_contrataciones()
+async def admin_panel(
+    dj: Optional[str] = None,
+    estado: Optional[str] = None,
+    desde: Optional[str] = None,
+    hasta: Optional[str] = None,
+    antes: Optional[int] = None,
+    limite: int = ADMIN_PAGE_SIZE
+):
+    """Panel de administración para ver contrataciones (paginado y con filtros)"""
+    limite = max(1, min(limite, ADMIN_MAX_PAGE_SIZE))
+    filtros = filtros_admin(dj, estado, desde, hasta)
+    contrataciones, resumen = await get_contrataciones_pagina(filtros, antes, limite)
+    siguiente = contrataciones[limite - 1]["id"] if len(contrataciones) > limite else None
+    contrataciones = contrataciones[:limite]
+    
+    # Parámetros de los filtros para los enlaces de paginación
+    parametros_filtros = {
+        clave: valor for clave, valor in
+        {"dj": dj, "estado": estado, "desde": desde, "hasta": hasta, "limite": limite}.items()
+        if valor
+    }
+    parametros_exportacion = urlencode({clave: valor for clave, valor in parametros_filtros.items() if clave != "limite"})
+    enlaces_exportacion = " · ".join(
+        f'<a href="/admin/export/{formato}?{parametros_exportacion}">{formato.upper()}</a>'
+        for formato in EXPORTADORES
+    )
+    opciones_djs = "".join(f'<option value="{html.escape(nombre)}">' for nombre in dj_catalog.nombres())
+    opciones_estado = "".join(
+        f'<option value="{valor}"{" selected" if estado == valor else ""}>{texto}</option>'
+        for valor, texto in [("", "Todos"), ("confirmada", "Confirmada"), ("cancelada", "Cancelada")]
+    )
     
     html_content = f"""
     <!DOCTYPE html>
@@ -688,6 +860,64 @@ async def admin_panel():
                 color: #95a5a6;
             }}
             
+            .filters {{
+                background: white;
+                padding: 20px;
+                border-radius: 10px;
+                box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+                margin-bottom: 30px;
+                display: flex;
+                flex-wrap: wrap;
+                gap: 15px;
+                align-items: flex-end;
+            }}
+            
+            .filters label {{
+                display: flex;
+                flex-direction: column;
+                font-size: 0.8rem;
+                color: #7f8c8d;
+                text-transform: uppercase;
+                letter-spacing: 1px;
+            }}
+            
+            .filters input, .filters select, .filters button {{
+                margin-top: 5px;
+                padding: 8px 10px;
+                border: 1px solid #dfe6e9;
+                border-radius: 5px;
+                font-size: 0.9rem;
+            }}
+            
+            .filters button {{
+                background: #3498db;
+                color: white;
+                border: none;
+                cursor: pointer;
+            }}
+            
+            .exports {{
+                float: right;
+                font-size: 0.9rem;
+                font-weight: normal;
+            }}
+            
+            .exports a {{
+                color: white;
+            }}
+            
+            .pagination {{
+                display: flex;
+                justify-content: space-between;
+                padding: 20px;
+            }}
+            
+            .pagination a {{
+                color: #3498db;
+                text-decoration: none;
+                font-weight: 600;
+            }}
+            
             @media (max-width: 768px) {{
                 .container {{
                     padding: 10px;
@@ -714,31 +944,49 @@ async def admin_panel():
                 <p>Gestión de Contrataciones - Funndication DJ Bookings</p>
             </div>
             
+            <form class="filters" method="get" action="/admin">
+                <label>DJ
+                    <input type="text" name="dj" list="djs" value="{html.escape(dj or '')}">
+                    <datalist id="djs">{opciones_djs}</datalist>
+                </label>
+                <label>Estado
+                    <select name="estado">{opciones_estado}</select>
+                </label>
+                <label>Evento desde
+                    <input type="text" name="desde" placeholder="dd/mm/aaaa" value="{html.escape(desde or '')}">
+                </label>
+                <label>Evento hasta
+                    <input type="text" name="hasta" placeholder="dd/mm/aaaa" value="{html.escape(hasta or '')}">
+                </label>
+                <button type="submit">Filtrar</button>
+            </form>
+            
             <div class="stats">
                 <div class="stat-card">
-                    <div class="stat-number">{len(contrataciones)}</div>
+                    <div class="stat-number">{resumen['total']}</div>
                     <div class="stat-label">Total Contrataciones</div>
                 </div>
                 <div class="stat-card">
-                    <div class="stat-number">{sum(c['precio_total'] for c in contrataciones):.0f}€</div>
+                    <div class="stat-number">{resumen['ingresos']:.0f}€</div>
                     <div class="stat-label">Ingresos Totales</div>
                 </div>
                 <div class="stat-card">
-                    <div class="stat-number">{len(set(c['dj_nombre'] for c in contrataciones))}</div>
+                    <div class="stat-number">{resumen['djs']}</div>
                     <div class="stat-label">DJs Contratados</div>
                 </div>
                 <div class="stat-card">
-                    <div class="stat-number">{len([c for c in contrataciones if c['estado'] == 'confirmada'])}</div>
+                    <div class="stat-number">{resumen['confirmadas']}</div>
                     <div class="stat-label">Confirmadas</div>
                 </div>
             </div>
     """
     
     if contrataciones:
-        html_content += """
+        html_content += f"""
             <div class="table-container">
                 <div class="table-header">
                     📋 Listado de Contrataciones
+                    <span class="exports">Exportar: {enlaces_exportacion}</span>
                 </div>
                 <table>
                     <thead>
@@ -759,26 +1007,31 @@ async def admin_panel():
                     <tbody>
         """
         
-        for c in contrataciones:
-            html_content += f"""
+        html_content += "".join(f"""
                         <tr>
                             <td>#{c['id']}</td>
-                            <td class="dj-name">{c['dj_nombre']}</td>
-                            <td>{c['cliente_nombre']}</td>
-                            <td>{c['cliente_telefono']}</td>
-                            <td>{c['cliente_email']}</td>
-                            <td>{c['localizacion']}</td>
-                            <td>{c['fecha_evento']}</td>
-                            <td>{c['duracion']}</td>
+                            <td class="dj-name">{html.escape(c['dj_nombre'])}</td>
+                            <td>{html.escape(c['cliente_nombre'])}</td>
+                            <td>{html.escape(c['cliente_telefono'])}</td>
+                            <td>{html.escape(c['cliente_email'])}</td>
+                            <td>{html.escape(c['localizacion'])}</td>
+                            <td>{html.escape(c['fecha_evento'])}</td>
+                            <td>{html.escape(c['duracion'])}</td>
                             <td class="price">{c['precio_total']:.0f}€</td>
-                            <td>{c['fecha_contratacion'][:16]}</td>
-                            <td><span class="status status-{c['estado']}">{c['estado']}</span></td>
+                            <td>{html.escape(c['fecha_contratacion'][:16])}</td>
+                            <td><span class="status status-{html.escape(c['estado'])}">{html.escape(c['estado'])}</span></td>
                         </tr>
-            """
+            """ for c in contrataciones)
         
-        html_content += """
+        primera = f'<a href="/admin?{urlencode(parametros_filtros)}">« Primera página</a>' if antes else "<span></span>"
+        pagina_siguiente = (
+            f'<a href="/admin?{urlencode({**parametros_filtros, "antes": siguiente})}">Siguiente página »</a>'
+            if siguiente else "<span></span>"
+        )
+        html_content += f"""
                     </tbody>
                 </table>
+                <div class="pagination">{primera}{pagina_siguiente}</div>
             </div>
         """
     else:
@@ -799,10 +1052,91 @@ async def admin_panel():
     
     return html_content
 
+@app.get("/admin/export/{formato}")
+async def admin_export(
+    formato: str,
+    dj: Optional[str] = None,
+    estado: Optional[str] = None,
+    desde: Optional[str] = None,
+    hasta: Optional[str] = None
+):
+    """Exporta las contrataciones filtradas (csv, ndjson o html) en streaming"""
+    if formato not in EXPORTADORES:
+        raise HTTPException(status_code=404, detail=f"Formato no soportado: {formato}")
+    
+    tipo, extension = FORMATOS[formato]
+    lotes = bookings.exportar_lotes(**filtros_admin(dj, estado, desde, hasta))
+    headers = {}
+    if formato != "html":
+        headers["Content-Disposition"] = f'attachment; filename="contrataciones.{extension}"'
+    
+    # Generador síncrono: Starlette lo consume en su pool de hilos, lote a lote.
+    # Starlette no cierra el generador si el cliente se desconecta: la tarea de
+    # fondo (que se ejecuta en ambos casos) libera la conexión dedicada
+    return StreamingResponse(
+        EXPORTADORES[formato](lotes, COLUMNAS_EXPORTACION),
+        media_type=tipo,
+        headers=headers,
+        background=BackgroundTask(lotes.close)
+    )
+
+@app.get("/stats")
+async def stats_endpoint(meses: int = 12):
+    """Estadísticas de contrataciones e ingresos (totales, por DJ y por mes)"""
+    return await bookings.stats(max(1, min(meses, 120)))
+
+@app.get("/availability")
+async def availability_endpoint(
+    start: str,
+    end: str,
+    dj: Optional[List[str]] = Query(None),
+    weekends: bool = False
+):
+    """Disponibilidad de los DJs en un rango de fechas (matriz libre/ocupado)"""
+    try:
+        desde, hasta, djs = preparar_consulta_disponibilidad(dj_catalog, start, end, dj)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    ocupadas = await bookings.busy_dates(djs, desde, hasta)
+    return matriz_disponibilidad(rango_fechas(desde, hasta, weekends), djs, ocupadas)
+
+@app.get("/quote")
+async def quote_endpoint(
+    location: str,
+    duration: str = "1",
+    dj: Optional[List[str]] = Query(None)
+):
+    """Presupuesto de todos los DJs (o de los indicados) para un mismo evento"""
+    if duration.strip().isdigit():
+        duration = f"{duration.strip()} horas"
+    
+    djs = None
+    if dj:
+        artistas = [dj_catalog.get(nombre) for nombre in dj]
+        desconocidos = [nombre for nombre, artista in zip(dj, artistas) if artista is None]
+        if desconocidos:
+            raise HTTPException(status_code=400, detail=f"DJ desconocido: {', '.join(desconocidos)}")
+        djs = [artista.nombre for artista in artistas]
+    
+    presupuestos = motor_de_precios(djs_database).quote_all(location, duration, djs)
+    if not presupuestos:
+        raise HTTPException(status_code=404, detail="No hay tarifas cargadas")
+    return {
+        "localizacion": location,
+        "zona": presupuestos[0].zona,
+        "horas": presupuestos[0].horas,
+        "presupuestos": [presupuesto.to_dict() for presupuesto in presupuestos],
+    }
+
 @app.get("/health")
 async def health_check():
     """Endpoint de salud para Railway"""
-    return {"status": "healthy", "message": "Funndication DJ Bookings API is running"}
+    health = {"status": "healthy", "message": "Funndication DJ Bookings API is running"}
+    health["sessions"] = await sessions.metrics_async()
+    if OPENAI_ENABLED:
+        health["intent_stats"] = openai_handler.intent_stats
+    return health
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,160 @@
+import os
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from catalog import DJCatalog, normalizar
+from keywords import ALIAS_DJS, palabras_clave
+
+_PALABRA = re.compile(r"[a-z0-9]+")
+
+# Palabras de los nombres que no identifican a nadie por sí solas
+_PALABRAS_GENERICAS = {"the", "dj", "los", "las", "del", "mc"}
+
+
+def distancia_acotada(a: str, b: str, maximo: int) -> Optional[int]:
+    """Distancia de Levenshtein entre a y b, o None si supera maximo.
+
+    Solo se calcula la banda de la matriz a menos de maximo de la diagonal y
+    se abandona en cuanto toda una fila la supera.
+    """
+    if abs(len(a) - len(b)) > maximo:
+        return None
+    if a == b:
+        return 0
+    infinito = maximo + 1
+    anterior = [j if j <= maximo else infinito for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        actual = [infinito] * (len(b) + 1)
+        if i <= maximo:
+            actual[0] = i
+        desde, hasta = max(1, i - maximo), min(len(b), i + maximo)
+        for j in range(desde, hasta + 1):
+            coste = 0 if a[i - 1] == b[j - 1] else 1
+            actual[j] = min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + coste)
+        if min(actual[desde - 1:hasta + 1]) > maximo:
+            return None
+        anterior = actual
+    return anterior[-1] if anterior[-1] <= maximo else None
+
+
+def errores_admitidos(longitud: int) -> int:
+    """Erratas toleradas según la longitud: ninguna en palabras de hasta cinco letras"""
+    if longitud <= 5:
+        return 0
+    if longitud <= 8:
+        return 1
+    return 2
+
+
+def _trigramas(texto: str) -> Set[str]:
+    relleno = f" {texto} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+def alias_de_entorno(valor: Optional[str] = None) -> Dict[str, str]:
+    """Alias configurados en DJ_ALIASES ('brainki=The Brainkiller;el tortu=Tortu')"""
+    valor = os.getenv("DJ_ALIASES", "") if valor is None else valor
+    alias = {}
+    for entrada in valor.split(";"):
+        if "=" not in entrada:
+            continue
+        nombre_alias, nombre = (parte.strip() for parte in entrada.split("=", 1))
+        if nombre_alias and nombre:
+            alias[nombre_alias] = nombre
+    return alias
+
+
+class ArtistResolver:
+    """Resuelve nombres de artista con erratas ('brainkiler', 'wardien').
+
+    Cada alias (nombre completo, palabras distintivas y alias configurados)
+    se indexa por sus trigramas. Para cada palabra o pareja de palabras del
+    mensaje se cuentan los trigramas compartidos y solo los alias que pueden
+    estar a la distancia permitida (lema de los q-gramas) pasan a la
+    distancia de Levenshtein acotada, así que el coste no crece con el
+    número de artistas sino con los candidatos parecidos.
+    """
+
+    def __init__(self, alias: Optional[Dict[str, str]] = None):
+        self._alias: List[Tuple[str, str]] = []
+        self._claves: Dict[str, int] = {}
+        self._por_trigrama: Dict[str, List[int]] = defaultdict(list)
+        self.max_palabras = 1
+        for nombre_alias, nombre in (alias or {}).items():
+            self.add(nombre_alias, nombre)
+
+    @classmethod
+    def por_defecto(cls) -> "ArtistResolver":
+        return cls({**ALIAS_DJS, **alias_de_entorno()})
+
+    def __len__(self) -> int:
+        return len(self._alias)
+
+    def add(self, alias: str, nombre: str) -> None:
+        """Añade un alias (sin efecto si ya existía)"""
+        clave = " ".join(_PALABRA.findall(normalizar(alias)))
+        if not clave or clave in self._claves:
+            return
+        posicion = len(self._alias)
+        self._alias.append((clave, nombre))
+        self._claves[clave] = posicion
+        for trigrama in _trigramas(clave):
+            self._por_trigrama[trigrama].append(posicion)
+        self.max_palabras = max(self.max_palabras, len(clave.split()))
+
+    def registrar_artistas(self, catalog: DJCatalog) -> None:
+        """Alias de cada artista del catálogo, con el nombre que ya usan las contrataciones"""
+        for artista in catalog:
+            nombre = palabras_clave.dj(artista.nombre) or artista.nombre
+            self.add(artista.clave, nombre)
+            for palabra in _PALABRA.findall(artista.clave):
+                if len(palabra) >= 4 and palabra not in _PALABRAS_GENERICAS:
+                    self.add(palabra, nombre)
+
+    def _mejor(self, termino: str) -> Optional[Tuple[int, int, str]]:
+        """(distancia, -trigramas compartidos, nombre) del alias más parecido al término"""
+        exacto = self._claves.get(termino)
+        if exacto is not None:
+            return 0, 0, self._alias[exacto][1]
+        # Tope para cualquier alias: como mucho dos letras más largo que el término
+        maximo = errores_admitidos(len(termino) + 2)
+        if maximo == 0:
+            return None
+
+        trigramas = _trigramas(termino)
+        compartidos: Dict[int, int] = defaultdict(int)
+        for trigrama in trigramas:
+            for posicion in self._por_trigrama.get(trigrama, ()):
+                compartidos[posicion] += 1
+
+        mejor = None
+        for posicion, comunes in compartidos.items():
+            clave, nombre = self._alias[posicion]
+            permitidos = errores_admitidos(max(len(termino), len(clave)))
+            # Cada edición rompe como mucho tres trigramas
+            if permitidos == 0 or comunes < max(len(termino), len(clave)) - 3 * permitidos:
+                continue
+            distancia = distancia_acotada(termino, clave, permitidos)
+            if distancia is None:
+                continue
+            candidato = (distancia, -comunes, nombre)
+            if mejor is None or candidato < mejor:
+                mejor = candidato
+        return mejor
+
+    def resolver(self, texto: str) -> Optional[str]:
+        """Artista al que más se parece alguna palabra (o grupo de palabras) del texto"""
+        palabras = _PALABRA.findall(normalizar(texto))
+        mejor = None
+        for inicio in range(len(palabras)):
+            for longitud in range(1, min(self.max_palabras, len(palabras) - inicio) + 1):
+                resultado = self._mejor(" ".join(palabras[inicio:inicio + longitud]))
+                if resultado is not None and (mejor is None or resultado < mejor):
+                    mejor = resultado
+                    if mejor[0] == 0:
+                        return mejor[2]
+        return mejor[2] if mejor else None
+
+
+artistas = ArtistResolver.por_defecto()
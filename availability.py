@@ -0,0 +1,85 @@
+import datetime
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from catalog import normalizar
+
+
+class AvailabilityCalendar:
+    """Calendario de ocupación en memoria: un bit por DJ y día.
+
+    Cubre una ventana fija de días (por defecto desde hace un año hasta
+    dentro de cuatro). Cada artista ocupa un bytearray de ~230 bytes, así que
+    consultar si un DJ está libre, o qué DJs lo están un día concreto, no
+    toca la base de datos. Las fechas fuera de la ventana no están cubiertas
+    y deben consultarse en SQLite.
+    """
+
+    def __init__(self, inicio: datetime.date, dias: int):
+        self.inicio = inicio
+        self.dias = dias
+        self._bits: Dict[str, bytearray] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def ventana(cls, anios_atras: int = 1, anios_adelante: int = 4,
+                hoy: Optional[datetime.date] = None) -> "AvailabilityCalendar":
+        hoy = hoy or datetime.date.today()
+        inicio = hoy - datetime.timedelta(days=365 * anios_atras)
+        return cls(inicio, 366 * (anios_atras + anios_adelante))
+
+    def _posicion(self, fecha: datetime.date) -> Optional[int]:
+        posicion = (fecha - self.inicio).days
+        return posicion if 0 <= posicion < self.dias else None
+
+    def cubre(self, fecha: datetime.date) -> bool:
+        return self._posicion(fecha) is not None
+
+    def reservar(self, dj: str, fecha: datetime.date) -> None:
+        """Marca el día como ocupado (sin efecto fuera de la ventana)"""
+        posicion = self._posicion(fecha)
+        if posicion is None:
+            return
+        clave = normalizar(dj)
+        with self._lock:
+            bits = self._bits.get(clave)
+            if bits is None:
+                bits = self._bits[clave] = bytearray((self.dias + 7) // 8)
+            bits[posicion >> 3] |= 1 << (posicion & 7)
+
+    def liberar(self, dj: str, fecha: datetime.date) -> None:
+        """Marca el día como libre (cancelaciones; sin efecto fuera de la ventana)"""
+        posicion = self._posicion(fecha)
+        if posicion is None:
+            return
+        with self._lock:
+            bits = self._bits.get(normalizar(dj))
+            if bits is not None:
+                bits[posicion >> 3] &= ~(1 << (posicion & 7)) & 0xFF
+
+    def ocupado(self, dj: str, fecha: datetime.date) -> bool:
+        posicion = self._posicion(fecha)
+        if posicion is None:
+            raise ValueError(f"{fecha} está fuera del calendario")
+        with self._lock:
+            bits = self._bits.get(normalizar(dj))
+            return bits is not None and bool(bits[posicion >> 3] & (1 << (posicion & 7)))
+
+    def free_djs(self, fecha: datetime.date, djs: Iterable[str]) -> List[str]:
+        """DJs de la lista que no tienen nada confirmado ese día"""
+        return [dj for dj in djs if not self.ocupado(dj, fecha)]
+
+    def dias_ocupados(self, dj: str, desde: datetime.date, hasta: datetime.date) -> List[datetime.date]:
+        """Días con contratación confirmada del DJ dentro del rango (cubierto por la ventana)"""
+        inicio, fin = self._posicion(desde), self._posicion(hasta)
+        if inicio is None or fin is None:
+            raise ValueError(f"{desde} - {hasta} está fuera del calendario")
+        with self._lock:
+            bits = self._bits.get(normalizar(dj))
+            if bits is None:
+                return []
+            return [
+                self.inicio + datetime.timedelta(days=posicion)
+                for posicion in range(inicio, fin + 1)
+                if bits[posicion >> 3] & (1 << (posicion & 7))
+            ]
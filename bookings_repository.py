@@ -0,0 +1,461 @@
+import asyncio
+import datetime
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from availability import AvailabilityCalendar
+from catalog import normalizar
+from db import ConnectionManager, bookings_db
+from fechas import normalizar_fecha, parsear_fecha
+
+COLUMNAS_CONTRATACION = [
+    'id', 'dj_nombre', 'cliente_nombre', 'cliente_telefono', 'cliente_email',
+    'localizacion', 'fecha_evento', 'duracion', 'precio_total',
+    'fecha_contratacion', 'estado'
+]
+
+# Exportaciones: columnas del panel más la fecha normalizada
+COLUMNAS_EXPORTACION = COLUMNAS_CONTRATACION + ['fecha_iso']
+
+
+def _condiciones(dj: Optional[str] = None, estado: Optional[str] = None,
+                 desde: Optional[datetime.date] = None,
+                 hasta: Optional[datetime.date] = None) -> Tuple[str, list]:
+    """Cláusula WHERE (sin la palabra WHERE) y parámetros para los filtros del panel"""
+    condiciones, parametros = [], []
+    if dj:
+        # Mismo DJ escriba como se escriba el nombre ('rodríguez' = 'Rodriguez')
+        condiciones.append("dj_clave = ?")
+        parametros.append(normalizar(dj))
+    if estado:
+        condiciones.append("estado = ?")
+        parametros.append(estado)
+    if desde:
+        condiciones.append("fecha_iso >= ?")
+        parametros.append(desde.isoformat())
+    if hasta:
+        condiciones.append("fecha_iso <= ?")
+        parametros.append(hasta.isoformat())
+    return " AND ".join(condiciones) or "1", parametros
+
+
+class BookingRepository:
+    """Acceso a la tabla contrataciones.
+
+    Los métodos síncronos los usa la versión de consola; los asíncronos
+    ejecutan las mismas consultas en un hilo dedicado a la base de datos,
+    de modo que los fsync de las escrituras y las lecturas completas del
+    panel no bloquean el bucle de eventos de FastAPI. Con un único hilo las
+    escrituras quedan además serializadas.
+
+    Tras cargar_calendario, la disponibilidad de las fechas dentro de la
+    ventana del calendario se responde desde memoria. Antes de cada consulta
+    se comprueba PRAGMA data_version y, si otra conexión (u otro worker) ha
+    escrito, se incorporan las filas nuevas y se recalculan los (DJ, día)
+    registrados en cambios_calendario (cancelaciones, cambios de estado o de
+    fecha). Las versiones asíncronas hacen esta comprobación en el hilo de
+    base de datos, nunca en el bucle de eventos.
+    """
+
+    def __init__(self, db: ConnectionManager):
+        self.db = db
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bookings-db")
+        self.calendario: Optional[AvailabilityCalendar] = None
+        self._ultimo_id = 0
+        self._ultimo_cambio = 0
+        self._versiones: Dict[int, int] = {}
+        self._lock_calendario = threading.Lock()
+
+    # --- Esquema ---
+
+    def migrar_esquema(self) -> None:
+        """Añade fecha_iso y dj_clave a tablas creadas antes de que existieran"""
+        conn = self.db.connection()
+        columnas = {fila[1] for fila in conn.execute("PRAGMA table_info(contrataciones)")}
+        if not columnas:
+            return
+        with conn:
+            if "fecha_iso" not in columnas:
+                conn.execute("ALTER TABLE contrataciones ADD COLUMN fecha_iso TEXT")
+            if "dj_clave" not in columnas:
+                conn.execute("ALTER TABLE contrataciones ADD COLUMN dj_clave TEXT")
+
+    def rellenar_dj_clave(self) -> int:
+        """Calcula dj_clave en las filas que no la tienen; devuelve cuántas se han rellenado.
+
+        Tiene que ejecutarse antes de rellenar_fecha_iso para que el índice
+        único ya vea la clave al normalizar las fechas. Las reservas duplicadas
+        de bases antiguas se quedan sin clave y se vuelven a intentar en cada
+        arranque; el aviso solo se muestra en el arranque que rellena filas.
+        """
+        conn = self.db.connection()
+        pendientes = conn.execute("SELECT id, dj_nombre FROM contrataciones WHERE dj_clave IS NULL").fetchall()
+        rellenadas = 0
+        duplicadas = []
+        with conn:
+            for id_contratacion, dj_nombre in pendientes:
+                try:
+                    conn.execute("UPDATE contrataciones SET dj_clave = ? WHERE id = ?",
+                                 (normalizar(dj_nombre), id_contratacion))
+                    rellenadas += 1
+                except sqlite3.IntegrityError:
+                    duplicadas.append(str(id_contratacion))
+        if duplicadas and rellenadas:
+            print(f"[WARNING] Contrataciones duplicadas (mismo DJ y día), se dejan sin clave de DJ: {', '.join(duplicadas)}")
+        return rellenadas
+
+    def rellenar_fecha_iso(self) -> int:
+        """Normaliza fecha_evento en las filas sin fecha_iso; devuelve cuántas se han rellenado"""
+        conn = self.db.connection()
+        pendientes = conn.execute(
+            "SELECT id, fecha_evento, date(fecha_contratacion) FROM contrataciones WHERE fecha_iso IS NULL"
+        ).fetchall()
+        rellenadas = 0
+        with conn:
+            for id_contratacion, fecha_evento, contratada in pendientes:
+                # Las fechas relativas ('mañana') se resuelven respecto al día en que se contrató
+                hoy = datetime.date.fromisoformat(contratada) if contratada else None
+                fecha_iso = normalizar_fecha(fecha_evento, hoy)
+                if not fecha_iso:
+                    continue
+                try:
+                    conn.execute("UPDATE contrataciones SET fecha_iso = ? WHERE id = ?", (fecha_iso, id_contratacion))
+                    rellenadas += 1
+                except sqlite3.IntegrityError:
+                    print(f"[WARNING] Contratación {id_contratacion} duplicada ({fecha_iso}): se deja sin fecha normalizada")
+        return rellenadas
+
+    def reconstruir_estadisticas(self) -> bool:
+        """Recalcula las tablas de estadísticas si no cuadran con contrataciones.
+
+        Solo hace falta en bases de datos anteriores a los triggers (o si se
+        han tocado a mano); devuelve True si se han reconstruido.
+        """
+        conn = self.db.connection()
+        filas = conn.execute("SELECT COUNT(*) FROM contrataciones").fetchone()[0]
+        agregadas = conn.execute("SELECT COALESCE(SUM(contrataciones), 0) FROM estadisticas_dj").fetchone()[0]
+        if filas == agregadas:
+            return False
+        with conn:
+            conn.execute("DELETE FROM estadisticas_dj")
+            conn.execute("DELETE FROM estadisticas_mes")
+            conn.execute("""
+                INSERT INTO estadisticas_dj (dj_nombre, contrataciones, confirmadas, ingresos)
+                SELECT dj_nombre, COUNT(*), SUM(estado IS 'confirmada'), SUM(precio_total)
+                FROM contrataciones GROUP BY dj_nombre
+            """)
+            conn.execute("""
+                INSERT INTO estadisticas_mes (mes, contrataciones, confirmadas, ingresos)
+                SELECT strftime('%Y-%m', fecha_contratacion), COUNT(*), SUM(estado IS 'confirmada'), SUM(precio_total)
+                FROM contrataciones GROUP BY 1
+            """)
+        return True
+
+    # --- Calendario en memoria ---
+
+    def cargar_calendario(self) -> int:
+        """Construye el calendario con las contrataciones confirmadas; devuelve cuántas"""
+        calendario = AvailabilityCalendar.ventana()
+        conn = self.db.connection()
+        with self._lock_calendario:
+            self.calendario = calendario
+            self._ultimo_id = 0
+            self._versiones.clear()
+            # El calendario parte del estado actual: los cambios anteriores ya están aplicados
+            with conn:
+                conn.execute("DELETE FROM cambios_calendario WHERE creado < datetime('now', '-30 days')")
+            self._ultimo_cambio = conn.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM cambios_calendario"
+            ).fetchone()[0]
+            return self._incorporar_nuevas()
+
+    def _incorporar_nuevas(self) -> int:
+        """Añade al calendario las confirmadas con id posterior a la última vista"""
+        conn = self.db.connection()
+        self._versiones[threading.get_ident()] = conn.execute("PRAGMA data_version").fetchone()[0]
+        self._aplicar_cambios(conn)
+        filas = conn.execute("""
+            SELECT id, dj_nombre, fecha_iso FROM contrataciones
+            WHERE id > ? AND estado = 'confirmada'
+            ORDER BY id
+        """, (self._ultimo_id,)).fetchall()
+        for id_contratacion, dj_nombre, fecha_iso in filas:
+            if fecha_iso:
+                self.calendario.reservar(dj_nombre, datetime.date.fromisoformat(fecha_iso))
+            self._ultimo_id = id_contratacion
+        return len(filas)
+
+    def _aplicar_cambios(self, conn: sqlite3.Connection) -> None:
+        """Recalcula los (DJ, día) tocados por cancelaciones, cambios o borrados"""
+        cambios = conn.execute(
+            "SELECT id, dj_nombre, fecha_iso FROM cambios_calendario WHERE id > ? ORDER BY id",
+            (self._ultimo_cambio,)
+        ).fetchall()
+        if not cambios:
+            return
+        self._ultimo_cambio = cambios[-1][0]
+        for dj_nombre, fecha_iso in {(normalizar(dj), fecha) for _, dj, fecha in cambios}:
+            fecha = datetime.date.fromisoformat(fecha_iso)
+            # Se normaliza aquí y no se usa dj_clave: las filas escritas por otras
+            # herramientas no la tienen hasta el siguiente arranque
+            confirmadas = conn.execute(
+                "SELECT dj_nombre FROM contrataciones WHERE fecha_iso = ? AND estado = 'confirmada'",
+                (fecha_iso,)
+            ).fetchall()
+            if any(normalizar(fila[0]) == dj_nombre for fila in confirmadas):
+                self.calendario.reservar(dj_nombre, fecha)
+            else:
+                self.calendario.liberar(dj_nombre, fecha)
+
+    def _calendario_para(self, fecha: Optional[datetime.date]) -> Optional[AvailabilityCalendar]:
+        """Calendario al día si cubre la fecha; None si hay que preguntar a SQLite"""
+        if self.calendario is None or fecha is None or not self.calendario.cubre(fecha):
+            return None
+        with self._lock_calendario:
+            # data_version solo cambia cuando otra conexión ha confirmado escrituras
+            version = self.db.connection().execute("PRAGMA data_version").fetchone()[0]
+            if self._versiones.get(threading.get_ident()) != version:
+                self._incorporar_nuevas()
+        return self.calendario
+
+    def libres(self, fecha_evento: str, djs: Iterable[str]) -> List[str]:
+        """DJs de la lista sin ninguna contratación confirmada esa fecha"""
+        djs = list(djs)
+        fecha = parsear_fecha(fecha_evento)
+        calendario = self._calendario_para(fecha)
+        if calendario is not None:
+            return calendario.free_djs(fecha, djs)
+        return [dj for dj in djs if self.disponible(dj, fecha_evento)]
+
+    def ocupacion(self, djs: Iterable[str], desde: datetime.date, hasta: datetime.date) -> Dict[str, Set[datetime.date]]:
+        """Días ocupados de cada DJ en el rango, del calendario o con una sola consulta por rango"""
+        djs = list(djs)
+        calendario = self._calendario_para(desde)
+        if calendario is not None and calendario.cubre(hasta):
+            return {dj: set(calendario.dias_ocupados(dj, desde, hasta)) for dj in djs}
+
+        ocupadas: Dict[str, Set[datetime.date]] = {dj: set() for dj in djs}
+        # Los nombres se comparan normalizados, igual que en el calendario
+        por_clave = {normalizar(dj): dj for dj in djs}
+        filas = self.db.connection().execute("""
+            SELECT dj_nombre, fecha_iso FROM contrataciones
+            WHERE fecha_iso BETWEEN ? AND ? AND estado = 'confirmada'
+        """, (desde.isoformat(), hasta.isoformat())).fetchall()
+        for dj_nombre, fecha_iso in filas:
+            dj = por_clave.get(normalizar(dj_nombre))
+            if dj is not None:
+                ocupadas[dj].add(datetime.date.fromisoformat(fecha_iso))
+        return ocupadas
+
+    def estadisticas(self, meses: int = 12) -> Dict:
+        """Totales, desglose por DJ y últimos meses, leídos de las tablas precalculadas"""
+        conn = self.db.connection()
+        columnas = ("contrataciones", "confirmadas", "ingresos")
+        por_dj = [
+            {"dj": fila[0], **dict(zip(columnas, fila[1:]))}
+            for fila in conn.execute("""
+                SELECT dj_nombre, contrataciones, confirmadas, ingresos
+                FROM estadisticas_dj ORDER BY ingresos DESC
+            """)
+        ]
+        por_mes = [
+            {"mes": fila[0], **dict(zip(columnas, fila[1:]))}
+            for fila in conn.execute("""
+                SELECT mes, contrataciones, confirmadas, ingresos
+                FROM estadisticas_mes ORDER BY mes DESC LIMIT ?
+            """, (meses,))
+        ]
+        totales = {columna: sum(fila[columna] for fila in por_dj) for columna in columnas}
+        totales["djs"] = len(por_dj)
+        return {"totales": totales, "por_dj": por_dj, "por_mes": por_mes}
+
+    # --- Consultas síncronas ---
+
+    def disponible(self, dj_nombre: str, fecha_evento: str) -> bool:
+        """True si el DJ no tiene ninguna contratación confirmada esa fecha"""
+        fecha = parsear_fecha(fecha_evento)
+        calendario = self._calendario_para(fecha)
+        if calendario is not None:
+            return not calendario.ocupado(dj_nombre, fecha)
+
+        fecha_iso = fecha.isoformat() if fecha else None
+        if fecha_iso:
+            cursor = self.db.connection().execute("""
+                SELECT 1 FROM contrataciones
+                WHERE dj_clave = ? AND fecha_iso = ? AND estado = 'confirmada'
+                LIMIT 1
+            """, (normalizar(dj_nombre), fecha_iso))
+        else:
+            # Fecha no reconocida: solo se puede comparar el texto tal cual
+            cursor = self.db.connection().execute("""
+                SELECT 1 FROM contrataciones
+                WHERE dj_clave = ? AND fecha_evento = ? AND estado = 'confirmada'
+                LIMIT 1
+            """, (normalizar(dj_nombre), fecha_evento))
+        return cursor.fetchone() is None
+
+    def guardar(self, dj: str, datos: Dict, precio_total: float) -> bool:
+        """Reserva la fecha y guarda la contratación en una sola sentencia.
+
+        Devuelve False si el DJ ya tiene esa fecha confirmada (por ejemplo,
+        otra sesión la ha cerrado mientras se recogían los datos). El índice
+        único parcial sobre (dj_clave, fecha_iso) lo garantiza para las fechas
+        reconocidas, escriba como se escriba el nombre del DJ; para las que no
+        se reconocen se compara el texto tal cual.
+        """
+        fecha = parsear_fecha(datos['fecha'])
+        fecha_iso = fecha.isoformat() if fecha else None
+        dj_clave = normalizar(dj)
+        with self.db.transaction() as conn:
+            cursor = conn.execute("""
+                INSERT INTO contrataciones
+                (dj_nombre, dj_clave, cliente_nombre, cliente_telefono, cliente_email,
+                 localizacion, fecha_evento, fecha_iso, duracion, precio_total)
+                SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
+                WHERE ? IS NOT NULL OR NOT EXISTS (
+                    SELECT 1 FROM contrataciones
+                    WHERE dj_clave = ? AND fecha_evento = ? AND estado = 'confirmada'
+                )
+                ON CONFLICT DO NOTHING
+            """, (
+                dj,
+                dj_clave,
+                datos['nombre'],
+                datos['telefono'],
+                datos['email'],
+                datos['localizacion'],
+                datos['fecha'],
+                fecha_iso,
+                datos['duracion'],
+                precio_total,
+                fecha_iso,
+                dj_clave,
+                datos['fecha']
+            ))
+            guardada = cursor.rowcount == 1
+        # Escritura inmediata en el calendario, sin esperar a la siguiente sincronización
+        # (también si la fecha ya estaba cogida: en ambos casos está ocupada)
+        if self.calendario is not None and fecha is not None:
+            self.calendario.reservar(dj, fecha)
+        return guardada
+
+    def listar(self, antes_de: Optional[int] = None, limite: Optional[int] = None, **filtros) -> List[Dict]:
+        """Contrataciones de la más reciente a la más antigua.
+
+        Paginación por clave: antes_de es el id de la última fila de la página
+        anterior, así que cada página cuesta lo mismo sea cual sea su posición.
+        Los filtros son los de _condiciones (dj, estado, desde, hasta).
+        """
+        where, parametros = _condiciones(**filtros)
+        if antes_de is not None:
+            where += " AND id < ?"
+            parametros.append(antes_de)
+        sql = f"""
+            SELECT id, dj_nombre, cliente_nombre, cliente_telefono, cliente_email,
+                   localizacion, fecha_evento, duracion, precio_total,
+                   fecha_contratacion, estado
+            FROM contrataciones
+            WHERE {where}
+            ORDER BY id DESC
+        """
+        if limite is not None:
+            sql += " LIMIT ?"
+            parametros.append(limite)
+        cursor = self.db.connection().execute(sql, parametros)
+        return [dict(zip(COLUMNAS_CONTRATACION, fila)) for fila in cursor.fetchall()]
+
+    def exportar_lotes(self, tamano_lote: int = 500, **filtros) -> Iterator[List[tuple]]:
+        """Recorre las contrataciones filtradas por lotes con un cursor abierto.
+
+        Usa una conexión dedicada y fetchmany, así que la memoria no depende
+        del número de filas. Las filas siguen el orden de COLUMNAS_EXPORTACION.
+        Si no se consume entero hay que llamar a close() para liberar la conexión.
+        """
+        where, parametros = _condiciones(**filtros)
+        with self.db.dedicated() as conn:
+            cursor = conn.execute(f"""
+                SELECT {", ".join(COLUMNAS_EXPORTACION)}
+                FROM contrataciones
+                WHERE {where}
+                ORDER BY id
+            """, parametros)
+            try:
+                while True:
+                    lote = cursor.fetchmany(tamano_lote)
+                    if not lote:
+                        break
+                    yield lote
+            finally:
+                # También al cerrar el generador a medias (cliente desconectado)
+                cursor.close()
+
+    def resumen(self, **filtros) -> Dict:
+        """Totales para los mismos filtros que listar.
+
+        Sin filtros, o filtrando solo por DJ, se leen de estadisticas_dj; con
+        el resto de filtros se agregan en SQLite sobre las filas filtradas.
+        """
+        if not any(valor for clave, valor in filtros.items() if clave != "dj"):
+            # estadisticas_dj tiene una fila por nombre tal cual se guardó: se
+            # suman todas las variantes del DJ pedido (es una fila por DJ, pocas)
+            clave = normalizar(filtros["dj"]) if filtros.get("dj") else None
+            filas = [
+                fila for fila in self.db.connection().execute(
+                    "SELECT dj_nombre, contrataciones, ingresos, confirmadas FROM estadisticas_dj"
+                )
+                if clave is None or normalizar(fila[0]) == clave
+            ]
+            return {
+                "total": sum(fila[1] for fila in filas),
+                "ingresos": sum(fila[2] for fila in filas),
+                "djs": len({normalizar(fila[0]) for fila in filas}),
+                "confirmadas": sum(fila[3] for fila in filas),
+            }
+
+        where, parametros = _condiciones(**filtros)
+        total, ingresos, djs, confirmadas = self.db.connection().execute(f"""
+            SELECT COUNT(*), COALESCE(SUM(precio_total), 0), COUNT(DISTINCT COALESCE(dj_clave, dj_nombre)),
+                   COALESCE(SUM(estado = 'confirmada'), 0)
+            FROM contrataciones
+            WHERE {where}
+        """, parametros).fetchone()
+        return {"total": total, "ingresos": ingresos, "djs": djs, "confirmadas": confirmadas}
+
+    # --- Versiones asíncronas (hilo de base de datos) ---
+
+    async def _ejecutar(self, funcion, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, funcion, *args)
+
+    async def is_available(self, dj_nombre: str, fecha_evento: str) -> bool:
+        return await self._ejecutar(self.disponible, dj_nombre, fecha_evento)
+
+    async def free_djs(self, fecha_evento: str, djs: Iterable[str]) -> List[str]:
+        return await self._ejecutar(self.libres, fecha_evento, list(djs))
+
+    async def save_booking(self, dj: str, datos: Dict, precio_total: float) -> bool:
+        return await self._ejecutar(self.guardar, dj, datos, precio_total)
+
+    async def busy_dates(self, djs: Iterable[str], desde: datetime.date,
+                         hasta: datetime.date) -> Dict[str, Set[datetime.date]]:
+        return await self._ejecutar(self.ocupacion, list(djs), desde, hasta)
+
+    async def list_bookings(self, antes_de: Optional[int] = None, limite: Optional[int] = None,
+                            **filtros) -> List[Dict]:
+        return await self._ejecutar(lambda: self.listar(antes_de, limite, **filtros))
+
+    async def summarize(self, **filtros) -> Dict:
+        return await self._ejecutar(lambda: self.resumen(**filtros))
+
+    async def stats(self, meses: int = 12) -> Dict:
+        return await self._ejecutar(self.estadisticas, meses)
+
+    def close(self) -> None:
+        """Espera a las operaciones pendientes y cierra las conexiones"""
+        self._executor.shutdown(wait=True)
+        self.db.close_all()
+
+
+bookings = BookingRepository(bookings_db)
@@ -0,0 +1,165 @@
+import hashlib
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# Líneas del PDF de datos que no forman parte de la ficha de ningún artista
+PREFIJOS_IGNORADOS = ("CHATBOT", "ARTISTAS:", "INGRESOS", "PRESS")
+
+# Etiqueta normalizada del PDF -> clave del tramo de precio
+ETIQUETAS_PRECIO = {
+    "cache base": "base",
+    "cache fuera de malaga": "fuera_malaga",
+    "cache fuera de espana": "fuera_espana",
+}
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sin acentos y con espacios colapsados"""
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    sin_acentos = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return " ".join(sin_acentos.lower().split())
+
+
+def formatear_euros(cantidad: int) -> str:
+    """Formato del PDF: 1600 -> '1.600€'"""
+    return f"{cantidad:,}".replace(",", ".") + "€"
+
+
+def _parsear_euros(valor: str) -> Optional[int]:
+    """Convierte '1.600€' en 1600"""
+    coincidencia = re.search(r"\d[\d.]*", valor)
+    if not coincidencia:
+        return None
+    return int(coincidencia.group().replace(".", ""))
+
+
+@dataclass
+class DJRecord:
+    """Ficha de un artista tal y como aparece en el PDF de datos"""
+    nombre: str
+    procedencia: str = ""
+    estilo: str = ""
+    precios: Dict[str, int] = field(default_factory=dict)
+    horas_base: int = 1
+    precio_hora_extra: int = 0
+    disponibilidad: str = ""
+    enlaces: Dict[str, str] = field(default_factory=dict)
+    lineas: List[str] = field(default_factory=list)
+
+    @property
+    def clave(self) -> str:
+        return normalizar(self.nombre)
+
+    @property
+    def texto(self) -> str:
+        return "\n".join(self.lineas)
+
+
+class DJCatalog:
+    """Catálogo de DJs parseado una sola vez a partir del texto del PDF de datos"""
+
+    def __init__(self, artistas: List[DJRecord], listing: str = "", cuenta: str = "", press_kits: str = "",
+                 version: str = "", listing_chunks: Optional[List[str]] = None):
+        self.artistas = artistas
+        self.cuenta = cuenta
+        self.press_kits = press_kits
+        # Hash del texto de origen: cambia cuando cambia el PDF de datos
+        self.version = version
+        # Listado ya renderizado para mostrar en la web, entero y por artista
+        self.listing = listing
+        self.listing_chunks = listing_chunks or ([listing] if listing else [])
+        self._por_clave = {artista.clave: artista for artista in artistas}
+
+    @classmethod
+    def from_text(cls, database: str) -> "DJCatalog":
+        """Parsea el texto del PDF de datos en fichas de artista"""
+        artistas: List[DJRecord] = []
+        bloques: List[str] = []
+        bloque = ""
+        actual: Optional[DJRecord] = None
+        cuenta = ""
+        press_kits = ""
+
+        for linea in database.split("\n"):
+            linea = linea.strip()
+            if not linea:
+                continue
+
+            if linea.startswith("INGRESOS"):
+                cuenta = linea.split(":", 1)[-1].strip()
+            elif linea.startswith("PRESS"):
+                press_kits = linea.split(":", 1)[-1].strip()
+
+            if linea.startswith("NOMBRE:"):
+                if bloque:
+                    bloques.append(bloque)
+                bloque = linea + "\n"
+                actual = DJRecord(nombre=linea.split(":", 1)[1].strip())
+                artistas.append(actual)
+            elif not linea.startswith(PREFIJOS_IGNORADOS):
+                bloque += linea + "\n"
+
+            if actual is None or linea.startswith(PREFIJOS_IGNORADOS) or linea.startswith("___"):
+                continue
+            actual.lineas.append(linea)
+            cls._parsear_linea(actual, linea)
+
+        if bloque:
+            bloques.append(bloque)
+
+        separador = "\n" + "-" * 50 + "\n\n"
+        listing_chunks = [bloque + separador for bloque in bloques[:-1]] + bloques[-1:]
+        version = hashlib.sha256(database.encode("utf-8")).hexdigest()
+        return cls(artistas, listing="".join(listing_chunks), cuenta=cuenta, press_kits=press_kits,
+                   version=version, listing_chunks=listing_chunks)
+
+    @staticmethod
+    def _parsear_linea(artista: DJRecord, linea: str) -> None:
+        """Rellena los campos de la ficha a partir de una línea 'ETIQUETA: valor'"""
+        etiqueta_normalizada = normalizar(linea)
+
+        if etiqueta_normalizada.startswith("cache base ="):
+            horas = re.search(r"\d+", linea)
+            if horas:
+                artista.horas_base = int(horas.group())
+            return
+
+        hora_extra = re.search(r"(\d[\d.]*)\s*€\s*por cada hora", linea)
+        if hora_extra:
+            artista.precio_hora_extra = _parsear_euros(hora_extra.group(1)) or 0
+            return
+
+        if ":" not in linea:
+            return
+
+        etiqueta, valor = linea.split(":", 1)
+        etiqueta = normalizar(etiqueta)
+        valor = valor.strip()
+
+        if etiqueta in ETIQUETAS_PRECIO:
+            precio = _parsear_euros(valor)
+            if precio is not None:
+                artista.precios[ETIQUETAS_PRECIO[etiqueta]] = precio
+        elif etiqueta == "procedencia":
+            artista.procedencia = valor
+        elif etiqueta == "estilo":
+            artista.estilo = valor
+        elif etiqueta == "fechas disponibles":
+            artista.disponibilidad = valor
+        elif etiqueta in ("instagram", "soundcloud"):
+            artista.enlaces[etiqueta] = valor
+
+    def get(self, nombre: str) -> Optional[DJRecord]:
+        """Ficha de un artista por nombre (sin distinguir acentos ni mayúsculas)"""
+        return self._por_clave.get(normalizar(nombre))
+
+    def nombres(self) -> List[str]:
+        return [artista.nombre for artista in self.artistas]
+
+    def __iter__(self):
+        return iter(self.artistas)
+
+    def __len__(self) -> int:
+        return len(self.artistas)
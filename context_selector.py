@@ -0,0 +1,94 @@
+from typing import List, Optional
+
+from catalog import DJCatalog, DJRecord, formatear_euros, normalizar
+from search_index import BM25Index
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimación rápida de tokens (~4 caracteres por token)"""
+    return len(texto) // 4 + 1
+
+
+def linea_precios(artista: DJRecord) -> str:
+    """Línea de precios de un artista para el prompt"""
+    precios = artista.precios
+    partes = []
+    if "base" in precios:
+        partes.append(f"{formatear_euros(precios['base'])} base (Málaga)")
+    if "fuera_malaga" in precios:
+        partes.append(f"{formatear_euros(precios['fuera_malaga'])} fuera Málaga")
+    if "fuera_espana" in precios:
+        partes.append(f"{formatear_euros(precios['fuera_espana'])} fuera España")
+    return f"- {artista.nombre}: " + ", ".join(partes)
+
+
+class ContextSelector:
+    """Selecciona las fichas de artistas relevantes para un mensaje.
+
+    En lugar de mandar el catálogo completo en cada llamada a OpenAI, se
+    incluyen primero las fichas completas de los artistas que mejor encajan
+    con el mensaje (nombre mencionado o puntuación BM25) y después las
+    líneas de precios del resto, siempre dentro del presupuesto de tokens.
+    """
+
+    def __init__(self, catalog: DJCatalog, max_tokens: int = 1500):
+        self.catalog = catalog
+        self.max_tokens = max_tokens
+        self.index = BM25Index([artista.texto for artista in catalog.artistas])
+        self.precios = [linea_precios(artista) for artista in catalog.artistas]
+        self._posicion = {artista.clave: i for i, artista in enumerate(catalog.artistas)}
+
+    def _ranking(self, mensaje: str) -> List[int]:
+        """Artistas relevantes para el mensaje, de más a menos relevante"""
+        puntuaciones = self.index.puntuar(mensaje)
+        mensaje_normalizado = normalizar(mensaje)
+        for i, artista in enumerate(self.catalog.artistas):
+            if artista.clave in mensaje_normalizado:
+                puntuaciones[i] = puntuaciones.get(i, 0.0) + 1000.0
+        return [i for i, _ in sorted(puntuaciones.items(), key=lambda item: (-item[1], item[0]))]
+
+    def select(self, mensaje: str, max_tokens: Optional[int] = None) -> str:
+        """Contexto de DJs y precios para el mensaje, dentro del presupuesto"""
+        return self._montar(self._ranking(mensaje), max_tokens or self.max_tokens)
+
+    def for_artist(self, nombre: str, max_tokens: Optional[int] = None) -> str:
+        """Contexto centrado en un artista concreto"""
+        posicion = self._posicion.get(normalizar(nombre))
+        if posicion is None:
+            return self.select(nombre, max_tokens)
+        return self._montar([posicion], max_tokens or self.max_tokens)
+
+    def _montar(self, relevantes: List[int], presupuesto: int) -> str:
+        fichas = []
+        usados = 0
+        incluidos = set()
+
+        for i in relevantes:
+            ficha = self.catalog.artistas[i].texto
+            coste = estimar_tokens(ficha) + estimar_tokens(self.precios[i])
+            if usados + coste > presupuesto:
+                break
+            fichas.append(ficha)
+            incluidos.add(i)
+            usados += coste
+
+        # Precios de los artistas incluidos primero y del resto mientras quepan
+        lineas = [self.precios[i] for i in relevantes if i in incluidos]
+        omitidos = 0
+        for i, linea in enumerate(self.precios):
+            if i in incluidos:
+                continue
+            coste = estimar_tokens(linea)
+            if usados + coste > presupuesto:
+                omitidos += 1
+                continue
+            lineas.append(linea)
+            usados += coste
+
+        contexto = ""
+        if fichas:
+            contexto += "INFORMACIÓN DE DJS RELEVANTES:\n" + "\n\n".join(fichas) + "\n\n"
+        contexto += "PRECIOS (EXACTOS):\n" + "\n".join(lineas)
+        if omitidos:
+            contexto += f"\n(... y {omitidos} artistas más en el catálogo)"
+        return contexto
@@ -4,19 +4,148 @@
 CREATE TABLE IF NOT EXISTS contrataciones (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     dj_nombre TEXT NOT NULL,
+    dj_clave TEXT,  -- dj_nombre normalizado (minúsculas, sin acentos): 'Jose Rodríguez' = 'Jose Rodriguez'
     cliente_nombre TEXT NOT NULL,
     cliente_telefono TEXT NOT NULL,
     cliente_email TEXT NOT NULL,
     localizacion TEXT NOT NULL,
     fecha_evento TEXT NOT NULL,
+    fecha_iso TEXT,  -- fecha_evento normalizada (AAAA-MM-DD), NULL si no se reconoce
     duracion TEXT NOT NULL,
     precio_total REAL NOT NULL,
     fecha_contratacion DATETIME DEFAULT CURRENT_TIMESTAMP,
     estado TEXT DEFAULT 'confirmada'
 );
 
+-- Los índices por DJ usan la clave normalizada; los antiguos sobre dj_nombre
+-- dejaban pasar 'Jose Rodríguez' y 'Jose Rodriguez' el mismo día
+DROP INDEX IF EXISTS idx_dj_fecha;
+DROP INDEX IF EXISTS idx_dj_fecha_iso_estado;
+DROP INDEX IF EXISTS idx_reserva_unica;
+
 -- Índice para búsquedas rápidas por DJ y fecha
-CREATE INDEX IF NOT EXISTS idx_dj_fecha ON contrataciones(dj_nombre, fecha_evento);
+CREATE INDEX IF NOT EXISTS idx_dj_clave_fecha ON contrataciones(dj_clave, fecha_evento);
+
+-- Índice de disponibilidad: una sola búsqueda por (DJ, fecha normalizada, estado)
+CREATE INDEX IF NOT EXISTS idx_dj_clave_fecha_iso_estado ON contrataciones(dj_clave, fecha_iso, estado);
+
+-- Un DJ no puede tener dos contrataciones confirmadas el mismo día
+CREATE UNIQUE INDEX IF NOT EXISTS idx_reserva_unica_clave ON contrataciones(dj_clave, fecha_iso)
+    WHERE estado = 'confirmada' AND fecha_iso IS NOT NULL;
+
+-- Búsquedas de disponibilidad por rango de fechas (todos los DJs)
+CREATE INDEX IF NOT EXISTS idx_confirmadas_fecha_iso ON contrataciones(fecha_iso) WHERE estado = 'confirmada';
+
+-- Filtros del panel de administración (SQLite añade el id al final de cada índice,
+-- así que también sirven para la paginación ORDER BY id DESC). El filtro por DJ
+-- usa idx_dj_clave_fecha, que empieza por dj_clave
+DROP INDEX IF EXISTS idx_dj;
+CREATE INDEX IF NOT EXISTS idx_estado ON contrataciones(estado);
+CREATE INDEX IF NOT EXISTS idx_fecha_iso ON contrataciones(fecha_iso);
+
+-- Estadísticas precalculadas para el panel: se mantienen con triggers en cada
+-- inserción, borrado o cambio de estado/precio, así que leerlas no recorre la tabla
+CREATE TABLE IF NOT EXISTS estadisticas_dj (
+    dj_nombre TEXT PRIMARY KEY,
+    contrataciones INTEGER NOT NULL DEFAULT 0,
+    confirmadas INTEGER NOT NULL DEFAULT 0,
+    ingresos REAL NOT NULL DEFAULT 0
+);
+
+-- Por mes de contratación (AAAA-MM)
+CREATE TABLE IF NOT EXISTS estadisticas_mes (
+    mes TEXT PRIMARY KEY,
+    contrataciones INTEGER NOT NULL DEFAULT 0,
+    confirmadas INTEGER NOT NULL DEFAULT 0,
+    ingresos REAL NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS estadisticas_insert AFTER INSERT ON contrataciones
+BEGIN
+    INSERT INTO estadisticas_dj (dj_nombre, contrataciones, confirmadas, ingresos)
+    VALUES (NEW.dj_nombre, 1, NEW.estado IS 'confirmada', NEW.precio_total)
+    ON CONFLICT(dj_nombre) DO UPDATE SET
+        contrataciones = contrataciones + 1,
+        confirmadas = confirmadas + excluded.confirmadas,
+        ingresos = ingresos + excluded.ingresos;
+    INSERT INTO estadisticas_mes (mes, contrataciones, confirmadas, ingresos)
+    VALUES (strftime('%Y-%m', NEW.fecha_contratacion), 1, NEW.estado IS 'confirmada', NEW.precio_total)
+    ON CONFLICT(mes) DO UPDATE SET
+        contrataciones = contrataciones + 1,
+        confirmadas = confirmadas + excluded.confirmadas,
+        ingresos = ingresos + excluded.ingresos;
+END;
+
+CREATE TRIGGER IF NOT EXISTS estadisticas_delete AFTER DELETE ON contrataciones
+BEGIN
+    UPDATE estadisticas_dj SET
+        contrataciones = contrataciones - 1,
+        confirmadas = confirmadas - (OLD.estado IS 'confirmada'),
+        ingresos = ingresos - OLD.precio_total
+    WHERE dj_nombre = OLD.dj_nombre;
+    UPDATE estadisticas_mes SET
+        contrataciones = contrataciones - 1,
+        confirmadas = confirmadas - (OLD.estado IS 'confirmada'),
+        ingresos = ingresos - OLD.precio_total
+    WHERE mes = strftime('%Y-%m', OLD.fecha_contratacion);
+    DELETE FROM estadisticas_dj WHERE dj_nombre = OLD.dj_nombre AND contrataciones <= 0;
+    DELETE FROM estadisticas_mes WHERE mes = strftime('%Y-%m', OLD.fecha_contratacion) AND contrataciones <= 0;
+END;
+
+-- Un cambio en las columnas agregadas equivale a quitar la fila antigua y sumar la nueva
+CREATE TRIGGER IF NOT EXISTS estadisticas_update
+AFTER UPDATE OF dj_nombre, estado, precio_total, fecha_contratacion ON contrataciones
+BEGIN
+    UPDATE estadisticas_dj SET
+        contrataciones = contrataciones - 1,
+        confirmadas = confirmadas - (OLD.estado IS 'confirmada'),
+        ingresos = ingresos - OLD.precio_total
+    WHERE dj_nombre = OLD.dj_nombre;
+    UPDATE estadisticas_mes SET
+        contrataciones = contrataciones - 1,
+        confirmadas = confirmadas - (OLD.estado IS 'confirmada'),
+        ingresos = ingresos - OLD.precio_total
+    WHERE mes = strftime('%Y-%m', OLD.fecha_contratacion);
+    INSERT INTO estadisticas_dj (dj_nombre, contrataciones, confirmadas, ingresos)
+    VALUES (NEW.dj_nombre, 1, NEW.estado IS 'confirmada', NEW.precio_total)
+    ON CONFLICT(dj_nombre) DO UPDATE SET
+        contrataciones = contrataciones + 1,
+        confirmadas = confirmadas + excluded.confirmadas,
+        ingresos = ingresos + excluded.ingresos;
+    INSERT INTO estadisticas_mes (mes, contrataciones, confirmadas, ingresos)
+    VALUES (strftime('%Y-%m', NEW.fecha_contratacion), 1, NEW.estado IS 'confirmada', NEW.precio_total)
+    ON CONFLICT(mes) DO UPDATE SET
+        contrataciones = contrataciones + 1,
+        confirmadas = confirmadas + excluded.confirmadas,
+        ingresos = ingresos + excluded.ingresos;
+    DELETE FROM estadisticas_dj WHERE contrataciones <= 0;
+    DELETE FROM estadisticas_mes WHERE contrataciones <= 0;
+END;
+
+-- Cambios que el calendario en memoria no ve como filas nuevas: cancelaciones,
+-- cambios de estado, de DJ o de fecha y borrados. Cada proceso lee las entradas
+-- posteriores a la última que vio y recalcula esos (DJ, día)
+CREATE TABLE IF NOT EXISTS cambios_calendario (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dj_nombre TEXT NOT NULL,
+    fecha_iso TEXT NOT NULL,
+    creado DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TRIGGER IF NOT EXISTS calendario_update
+AFTER UPDATE OF dj_nombre, fecha_iso, estado ON contrataciones
+BEGIN
+    INSERT INTO cambios_calendario (dj_nombre, fecha_iso)
+    SELECT OLD.dj_nombre, OLD.fecha_iso WHERE OLD.fecha_iso IS NOT NULL;
+    INSERT INTO cambios_calendario (dj_nombre, fecha_iso)
+    SELECT NEW.dj_nombre, NEW.fecha_iso WHERE NEW.fecha_iso IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS calendario_delete AFTER DELETE ON contrataciones
+WHEN OLD.fecha_iso IS NOT NULL
+BEGIN
+    INSERT INTO cambios_calendario (dj_nombre, fecha_iso) VALUES (OLD.dj_nombre, OLD.fecha_iso);
+END;
 
 -- Insertar datos de ejemplo (opcional)
 -- INSERT INTO contrataciones (dj_nombre, cliente_nombre, cliente_telefono, cliente_email, localizacion, fecha_evento, duracion, precio_total)
@@ -0,0 +1,81 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class ConnectionManager:
+    """Conexiones SQLite reutilizables, una por hilo.
+
+    Cada conexión se abre una sola vez con WAL y pragmas ajustados, y
+    conserva su caché de sentencias preparadas entre llamadas, así que las
+    consultas del chat no pagan el coste de abrir la base de datos cada vez.
+    """
+
+    def __init__(self, path: str, cache_kib: int = 8192, cached_statements: int = 256):
+        self.path = path
+        self.cache_kib = cache_kib
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._conexiones = []
+        self._lock = threading.Lock()
+
+    def _abrir(self) -> sqlite3.Connection:
+        # check_same_thread=False solo para poder cerrarlas todas desde close_all;
+        # cada conexión se usa únicamente desde el hilo que la creó
+        conn = sqlite3.connect(self.path, timeout=10, cached_statements=self.cached_statements,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{self.cache_kib}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA busy_timeout=10000")
+        with self._lock:
+            self._conexiones.append(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Conexión del hilo actual (se crea la primera vez)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._abrir()
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Conexión del hilo actual dentro de una transacción (commit o rollback)"""
+        conn = self.connection()
+        with conn:
+            yield conn
+
+    @contextmanager
+    def dedicated(self):
+        """Conexión propia, fuera del reparto por hilo, para lecturas largas (exportaciones).
+
+        Puede usarse desde varios hilos sucesivamente (p. ej. un generador que
+        Starlette va consumiendo en su pool de hilos) y se cierra al terminar.
+        """
+        conn = self._abrir()
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                if conn in self._conexiones:
+                    self._conexiones.remove(conn)
+            conn.close()
+
+    def close_all(self) -> None:
+        """Cierra todas las conexiones abiertas (al apagar la aplicación)"""
+        with self._lock:
+            for conn in self._conexiones:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._conexiones.clear()
+        self._local = threading.local()
+
+
+# Base de datos de contrataciones compartida por main.py y app.py
+bookings_db = ConnectionManager(os.getenv("DB_PATH", "contrataciones.db"))
@@ -0,0 +1,71 @@
+import csv
+import html
+import io
+import json
+from typing import Iterable, Iterator, List
+
+# Formato -> (tipo MIME, extensión del fichero descargado)
+FORMATOS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson; charset=utf-8", "ndjson"),
+    "html": ("text/html; charset=utf-8", "html"),
+}
+
+# Caracteres con los que Excel/LibreOffice interpretan una celda como fórmula
+_INICIO_FORMULA = ("=", "+", "-", "@", "\t", "\r")
+
+
+def celda_csv(valor):
+    """Neutraliza textos que la hoja de cálculo ejecutaría como fórmula ('=HYPERLINK(...)')"""
+    if isinstance(valor, str) and valor.startswith(_INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def exportar_csv(lotes: Iterable[List[tuple]], columnas: List[str]) -> Iterator[str]:
+    """CSV por trozos: cabecera y después un trozo por lote de filas"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    # BOM para que Excel abra el fichero con los acentos bien
+    buffer.write("\ufeff")
+    escritor.writerow(columnas)
+    yield buffer.getvalue()
+    for lote in lotes:
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows([celda_csv(valor) for valor in fila] for fila in lote)
+        yield buffer.getvalue()
+
+
+def exportar_ndjson(lotes: Iterable[List[tuple]], columnas: List[str]) -> Iterator[str]:
+    """Un objeto JSON por línea"""
+    for lote in lotes:
+        yield "".join(
+            json.dumps(dict(zip(columnas, fila)), ensure_ascii=False) + "\n" for fila in lote
+        )
+
+
+def exportar_html(lotes: Iterable[List[tuple]], columnas: List[str]) -> Iterator[str]:
+    """Tabla HTML sencilla (imprimible) generada por trozos"""
+    yield (
+        '<!DOCTYPE html>\n<html lang="es">\n<head>\n<meta charset="UTF-8">\n'
+        "<title>Contrataciones - Funndication DJ Bookings</title>\n"
+        "<style>body{font-family:sans-serif}table{border-collapse:collapse}"
+        "th,td{border:1px solid #ccc;padding:4px 8px;text-align:left}</style>\n"
+        "</head>\n<body>\n<table>\n<thead><tr>"
+        + "".join(f"<th>{html.escape(columna)}</th>" for columna in columnas)
+        + "</tr></thead>\n<tbody>\n"
+    )
+    for lote in lotes:
+        yield "".join(
+            "<tr>" + "".join(f"<td>{html.escape('' if valor is None else str(valor))}</td>" for valor in fila) + "</tr>\n"
+            for fila in lote
+        )
+    yield "</tbody>\n</table>\n</body>\n</html>\n"
+
+
+EXPORTADORES = {
+    "csv": exportar_csv,
+    "ndjson": exportar_ndjson,
+    "html": exportar_html,
+}
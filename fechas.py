@@ -0,0 +1,106 @@
+import datetime
+import re
+from typing import List, Optional
+
+from catalog import normalizar
+
+MESES = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6,
+    "julio": 7, "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10,
+    "noviembre": 11, "diciembre": 12,
+}
+# Abreviaturas de tres letras (ene, feb, ..., dic) y "sept"
+for _mes, _numero in list(MESES.items()):
+    MESES.setdefault(_mes[:3], _numero)
+MESES["sept"] = 9
+
+_ISO = re.compile(r"\b(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})\b")
+_NUMERICA = re.compile(r"\b(\d{1,2})[-/.](\d{1,2})(?:[-/.](\d{2}|\d{4}))?\b")
+_TEXTO = re.compile(r"\b(\d{1,2})\s*(?:de\s+)?([a-z]+)\.?(?:\s*(?:de\s+|del\s+)?(\d{4}))?\b")
+# "a las 22.30", "10.05h": horas, no fechas día.mes
+_ANTES_DE_HORA = re.compile(r"\blas?\s+$")
+_DESPUES_DE_HORA = re.compile(r"\s*(?:h|hrs?|horas?)\b")
+_RELATIVAS = {"hoy": 0, "manana": 1, "pasado manana": 2}
+# "por la mañana" es una franja horaria, no el día siguiente
+_FRANJA_MANANA = re.compile(r"\b(?:por|de|a|en) la manana\b")
+
+# date.weekday(): sábado y domingo
+FIN_DE_SEMANA = (5, 6)
+
+
+def _construir(anio: Optional[int], mes: int, dia: int, hoy: datetime.date) -> Optional[datetime.date]:
+    """Fecha válida o None; sin año se toma la próxima vez que caiga ese día"""
+    try:
+        if anio is not None:
+            if anio < 100:
+                anio += 2000
+            return datetime.date(anio, mes, dia)
+        fecha = datetime.date(hoy.year, mes, dia)
+        if fecha < hoy:
+            fecha = datetime.date(hoy.year + 1, mes, dia)
+        return fecha
+    except ValueError:
+        return None
+
+
+def parsear_fecha(texto: str, hoy: Optional[datetime.date] = None) -> Optional[datetime.date]:
+    """Interpreta la fecha escrita por el cliente.
+
+    Acepta '2025-12-25', '25/12/2025', '25-12-25', '25/12', '25 de diciembre
+    de 2025', '25 dic', 'hoy', 'mañana' y 'pasado mañana'. Los formatos
+    numéricos se leen siempre como día/mes. Una fecha explícita manda sobre
+    las palabras relativas ('25 de diciembre por la mañana' es el 25) y la
+    hora que la acompañe no se confunde con ella ('14 de junio a las 22.30').
+    """
+    hoy = hoy or datetime.date.today()
+    limpio = normalizar(texto)
+
+    coincidencia = _ISO.search(limpio)
+    if coincidencia:
+        anio, mes, dia = (int(parte) for parte in coincidencia.groups())
+        return _construir(anio, mes, dia, hoy)
+
+    # El nombre del mes no es ambiguo: va antes que los formatos numéricos,
+    # que también pueden ser una hora
+    for coincidencia in _TEXTO.finditer(limpio):
+        dia, mes, anio = coincidencia.groups()
+        if mes in MESES:
+            fecha = _construir(int(anio) if anio else None, MESES[mes], int(dia), hoy)
+            if fecha:
+                return fecha
+
+    for coincidencia in _NUMERICA.finditer(limpio):
+        dia, mes, anio = coincidencia.groups()
+        es_hora = "." in coincidencia.group() and not anio and (
+            _ANTES_DE_HORA.search(limpio, 0, coincidencia.start())
+            or _DESPUES_DE_HORA.match(limpio, coincidencia.end())
+        )
+        if es_hora:
+            continue
+        fecha = _construir(int(anio) if anio else None, int(mes), int(dia), hoy)
+        if fecha:
+            return fecha
+
+    relativo = _FRANJA_MANANA.sub(" ", limpio)
+    for expresion, dias in sorted(_RELATIVAS.items(), key=lambda item: -len(item[0])):
+        if re.search(rf"\b{expresion}\b", relativo):
+            return hoy + datetime.timedelta(days=dias)
+
+    return None
+
+
+def normalizar_fecha(texto: str, hoy: Optional[datetime.date] = None) -> Optional[str]:
+    """Fecha canónica ISO (AAAA-MM-DD) o None si no se reconoce"""
+    fecha = parsear_fecha(texto, hoy)
+    return fecha.isoformat() if fecha else None
+
+
+def rango_fechas(desde: datetime.date, hasta: datetime.date, solo_fines_de_semana: bool = False) -> List[datetime.date]:
+    """Días entre desde y hasta (ambos incluidos), opcionalmente solo sábados y domingos"""
+    fechas = []
+    fecha = desde
+    while fecha <= hasta:
+        if not solo_fines_de_semana or fecha.weekday() in FIN_DE_SEMANA:
+            fechas.append(fecha)
+        fecha += datetime.timedelta(days=1)
+    return fechas
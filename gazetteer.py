@@ -0,0 +1,278 @@
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from catalog import normalizar
+
+# Especificidad de cada entrada: en un texto con varios lugares manda el más
+# concreto ('Marbella, Málaga, España' -> Marbella), y entre iguales el último
+PAIS_O_REGION = 0
+PROVINCIA = 1
+MUNICIPIO = 2
+
+# Comarcas de la provincia de Málaga: caché base
+MALAGA_COMARCAS = (
+    "Provincia de Málaga", "Costa del Sol", "Axarquía", "Serranía de Ronda",
+)
+
+# Municipios de la provincia de Málaga y barrios conocidos: caché base
+MALAGA = (
+    "Málaga", "Puerto Banús", "San Pedro Alcántara", "Nueva Andalucía", "Mijas Costa", "Calahonda",
+    "La Cala de Mijas", "Torre del Mar", "Benajarafe", "Churriana", "Teatinos", "El Palo",
+    "Pedregalejo", "Guadalmar", "Campanillas", "Puerto de la Torre",
+    "Alcaucín", "Alfarnate", "Alfarnatejo", "Algarrobo", "Algatocín",
+    "Alhaurín de la Torre", "Alhaurín el Grande", "Almáchar", "Almargen", "Almogía", "Álora",
+    "Alozaina", "Alpandeire", "Antequera", "Árchez", "Archidona", "Ardales", "Arriate",
+    "Atajate", "Benadalid", "Benahavís", "Benalauría", "Benalmádena", "Benamargosa",
+    "Benamocarra", "Benaoján", "Benarrabá", "El Borge", "El Burgo", "Campillos",
+    "Canillas de Aceituno", "Canillas de Albaida", "Cañete la Real", "Carratraca", "Cartajima",
+    "Cártama", "Casabermeja", "Casarabonela", "Casares", "Coín", "Colmenar", "Comares",
+    "Cómpeta", "Cortes de la Frontera", "Cuevas Bajas", "Cuevas del Becerro",
+    "Cuevas de San Marcos", "Cútar", "Estepona", "Faraján", "Frigiliana", "Fuengirola",
+    "Fuente de Piedra", "Gaucín", "Genalguacil", "Guaro", "Humilladero", "Igualeja", "Istán",
+    "Iznate", "Jimera de Líbar", "Jubrique", "Júzcar", "Macharaviaya", "Manilva", "Marbella",
+    "Mijas", "Moclinejo", "Mollina", "Monda", "Montecorto", "Montejaque", "Nerja", "Ojén",
+    "Parauta", "Periana", "Pujerra", "Rincón de la Victoria", "Riogordo", "Ronda",
+    "Salares", "Sayalonga", "Sedella", "Serrato", "Sierra de Yeguas", "Teba", "Tolox",
+    "Torremolinos", "Torrox", "Totalán", "Valle de Abdalajís", "Vélez-Málaga",
+    "Villanueva de Algaidas", "Villanueva del Rosario", "Villanueva del Trabuco",
+    "Villanueva de la Concepción", "Villanueva de Tapia", "Viñuela", "Yunquera",
+)
+
+# Resto de España: país y comunidades autónomas
+ESPANA_REGIONES = (
+    "España", "Spain", "Andalucía", "Aragón", "Asturias", "Baleares",
+    "Islas Baleares", "Canarias", "Islas Canarias", "Cantabria", "Castilla y León",
+    "Castilla-La Mancha", "Cataluña", "Catalunya", "Comunidad Valenciana", "Extremadura",
+    "Galicia", "La Rioja", "Comunidad de Madrid", "Región de Murcia", "Navarra",
+    "País Vasco", "Euskadi",
+)
+
+# Resto de España: provincias que no se llaman como su capital, e islas
+ESPANA_PROVINCIAS = (
+    "Álava", "Guipúzcoa", "Gipuzkoa", "Vizcaya", "Bizkaia",
+    "Mallorca", "Menorca", "Ibiza", "Eivissa", "Formentera", "Tenerife", "Gran Canaria",
+    "Lanzarote", "Fuerteventura", "La Palma", "La Gomera", "El Hierro",
+)
+
+# Resto de España: municipios principales (las capitales con el nombre de su provincia)
+ESPANA = (
+    "Albacete", "Alicante", "Almería", "Ávila", "Badajoz", "Barcelona", "Burgos",
+    "Cáceres", "Cádiz", "Castellón", "Ciudad Real", "Córdoba", "A Coruña", "La Coruña",
+    "Cuenca", "Girona", "Gerona", "Granada", "Guadalajara", "Huelva",
+    "Huesca", "Jaén", "León", "Lleida", "Lérida", "Lugo", "Madrid", "Murcia", "Ourense",
+    "Orense", "Palencia", "Las Palmas", "Pontevedra", "Salamanca", "Santa Cruz de Tenerife",
+    "Segovia", "Sevilla", "Soria", "Tarragona", "Teruel", "Toledo", "Valencia", "Valladolid",
+    "Zamora", "Zaragoza",
+    "Ceuta", "Melilla", "Bilbao", "San Sebastián", "Donostia", "Vitoria", "Gasteiz", "Pamplona", "Iruña",
+    "Logroño", "Santander", "Oviedo", "Gijón", "Avilés", "Vigo", "Santiago de Compostela",
+    "Ferrol", "Palma", "Palma de Mallorca", "Jerez", "Jerez de la Frontera", "Algeciras", "La Línea de la Concepción",
+    "Sotogrande", "Chiclana", "Sanlúcar de Barrameda", "El Puerto de Santa María",
+    "Dos Hermanas", "Écija", "Motril", "Almuñécar", "Linares", "Úbeda",
+    "Baeza", "Roquetas de Mar", "El Ejido", "Mojácar", "Lucena", "Marchena", "Benidorm",
+    "Elche", "Elx", "Torrevieja", "Orihuela", "Denia", "Jávea", "Gandía", "Cartagena", "Lorca",
+    "Sitges", "Badalona", "Hospitalet de Llobregat", "Terrassa", "Sabadell", "Mataró",
+    "Reus", "Salou", "Lloret de Mar", "Tossa de Mar", "Figueres", "Móstoles", "Alcalá de Henares",
+    "Getafe", "Leganés", "Alcorcón", "Fuenlabrada", "Aranjuez", "Colmenar Viejo",
+    "Mérida", "Plasencia", "Ponferrada", "Talavera de la Reina",
+    "Puertollano", "Calatayud",
+)
+
+# Continentes y países del resto del mundo (en español y en inglés)
+PAISES = (
+    "Extranjero", "Europa", "Europe", "América", "Asia", "África", "Oceanía",
+    "Portugal", "Francia", "France", "Italia", "Italy", "Alemania", "Germany", "Reino Unido",
+    "United Kingdom", "Inglaterra", "England", "Escocia", "Scotland", "Gales", "Wales",
+    "Irlanda", "Ireland", "Irlanda del Norte", "Andorra", "Gibraltar", "Mónaco", "Monaco",
+    "Bélgica", "Belgium", "Holanda", "Países Bajos", "Netherlands", "Luxemburgo", "Suiza",
+    "Switzerland", "Austria", "Dinamarca", "Denmark", "Suecia", "Sweden", "Noruega", "Norway",
+    "Finlandia", "Finland", "Islandia", "Iceland", "Polonia", "Poland", "Chequia",
+    "República Checa", "Czechia", "Eslovaquia", "Hungría", "Hungary", "Rumanía", "Romania",
+    "Bulgaria", "Grecia", "Greece", "Croacia", "Croatia", "Eslovenia", "Serbia", "Bosnia",
+    "Montenegro", "Albania", "Macedonia del Norte", "Kosovo", "Malta", "Chipre", "Cyprus",
+    "Estonia", "Letonia", "Lituania", "Ucrania", "Ukraine", "Bielorrusia", "Moldavia", "Rusia",
+    "Russia", "Turquía", "Turkey", "Georgia", "Armenia", "Azerbaiyán", "San Marino",
+    "Liechtenstein", "Marruecos", "Morocco", "Argelia", "Túnez", "Libia", "Egipto", "Egypt",
+    "Senegal", "Mauritania", "Malí", "Nigeria", "Ghana", "Costa de Marfil", "Camerún",
+    "Kenia", "Etiopía", "Tanzania", "Sudáfrica", "South Africa", "Angola", "Mozambique",
+    "Cabo Verde", "Guinea Ecuatorial", "Estados Unidos", "EEUU", "EE UU",
+    "United States", "Canadá", "Canada", "México", "Mexico", "Guatemala", "Honduras",
+    "El Salvador", "Nicaragua", "Costa Rica", "Panamá", "Cuba", "República Dominicana",
+    "Puerto Rico", "Jamaica", "Colombia", "Venezuela", "Ecuador", "Perú", "Peru", "Bolivia",
+    "Chile", "Argentina", "Uruguay", "Paraguay", "Brasil", "Brazil", "Israel", "Líbano",
+    "Jordania", "Arabia Saudí", "Arabia Saudita", "Emiratos Árabes", "Emiratos Árabes Unidos",
+    "Qatar", "Catar", "Kuwait", "Omán", "Irán", "Irak", "India", "Pakistán", "China", "Japón",
+    "Japan", "Corea del Sur", "Tailandia", "Thailand", "Vietnam", "Indonesia",
+    "Filipinas", "Malasia", "Singapur", "Singapore", "Australia", "Nueva Zelanda",
+)
+
+# Regiones e islas del resto del mundo
+EXTRANJERO_REGIONES = ("Algarve", "Madeira", "Azores", "Bali")
+
+# Grandes ciudades del resto del mundo (en español y en inglés)
+EXTRANJERO = (
+    "Lisboa", "Lisbon", "Oporto", "Porto", "Albufeira", "París", "Paris", "Marsella", "Marseille", "Lyon", "Niza", "Burdeos", "Bordeaux",
+    "Toulouse", "Cannes", "Montpellier", "Biarritz", "Londres", "London", "Manchester",
+    "Liverpool", "Birmingham", "Bristol", "Leeds", "Edimburgo", "Edinburgh", "Glasgow",
+    "Dublín", "Dublin", "Belfast", "Roma", "Rome", "Milán", "Milan", "Nápoles", "Naples",
+    "Turín", "Florencia", "Venecia", "Bolonia", "Berlín", "Berlin", "Múnich", "Munich",
+    "Hamburgo", "Hamburg", "Fráncfort", "Frankfurt", "Düsseldorf", "Stuttgart",
+    "Ámsterdam", "Amsterdam", "Róterdam", "Rotterdam", "Bruselas", "Brussels", "Amberes",
+    "Antwerp", "Ginebra", "Geneva", "Zúrich", "Zurich", "Basilea", "Viena", "Vienna",
+    "Praga", "Prague", "Budapest", "Varsovia", "Warsaw", "Cracovia", "Copenhague",
+    "Copenhagen", "Estocolmo", "Stockholm", "Oslo", "Helsinki", "Atenas", "Athens", "Mykonos",
+    "Estambul", "Istanbul", "Moscú", "Moscow", "Kiev", "Bucarest", "Belgrado", "Zagreb",
+    "Tallin", "Riga", "Vilna", "Tánger", "Tanger", "Tetuán", "Casablanca", "Rabat",
+    "Marrakech", "Fez", "Agadir", "El Cairo", "Nueva York", "New York", "Miami",
+    "Los Ángeles", "Los Angeles", "Las Vegas", "San Francisco", "Chicago", "Boston",
+    "Toronto", "Montreal", "Ciudad de México", "Mexico City", "Cancún", "Cancun", "Tulum",
+    "Playa del Carmen", "Monterrey", "Bogotá", "Medellín", "Cartagena de Indias",
+    "Caracas", "Quito", "Lima", "Santiago de Chile", "Buenos Aires", "Montevideo", "Asunción",
+    "La Paz", "La Habana", "Punta Cana", "Santo Domingo", "São Paulo", "Sao Paulo",
+    "Río de Janeiro", "Rio de Janeiro", "Dubái", "Dubai", "Abu Dabi", "Abu Dhabi", "Doha",
+    "Tel Aviv", "Tokio", "Tokyo", "Pekín", "Beijing", "Shanghái", "Shanghai", "Hong Kong",
+    "Seúl", "Seoul", "Bangkok", "Sídney", "Sydney", "Melbourne",
+)
+
+# Siglas que también son palabras ('si usa su equipo'): solo cuentan en mayúsculas
+SIGLAS = {
+    "USA": "fuera_espana",
+    "UK": "fuera_espana",
+}
+
+# Municipios que también son un tipo de vía: 'Ronda de Outeiro' es una calle, no Ronda
+VIAS = ("Ronda",)
+
+# Frases explícitas del cliente; se indexan como cualquier otro lugar
+FRASES = {
+    "fuera de Málaga": "fuera_malaga",
+    "fuera de la provincia": "fuera_malaga",
+    "fuera de España": "fuera_espana",
+    "en el extranjero": "fuera_espana",
+}
+
+_PALABRA = re.compile(r"[a-z0-9]+")
+_PALABRA_ORIGINAL = re.compile(r"[A-Za-z0-9]+")
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Palabras normalizadas (sin acentos ni signos): 'Vélez-Málaga' -> ['velez', 'malaga']"""
+    return _PALABRA.findall(normalizar(texto))
+
+
+def _palabras_originales(texto: str) -> List[str]:
+    """Las mismas palabras que tokenizar, sin acentos pero con sus mayúsculas"""
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    return _PALABRA_ORIGINAL.findall("".join(c for c in descompuesto if not unicodedata.combining(c)))
+
+
+@dataclass(frozen=True)
+class Lugar:
+    """Lugar reconocido en un texto, el tramo de precio que le corresponde y su especificidad"""
+    nombre: str
+    zona: str
+    nivel: int = MUNICIPIO
+
+
+class Gazetteer:
+    """Índice de lugares (municipios, provincias, países y ciudades) -> tramo de precio.
+
+    Cada nombre se guarda como la tupla de sus palabras normalizadas en un
+    diccionario. Buscar recorre el texto una vez probando en cada posición
+    los n-gramas de mayor a menor longitud (acotada por el nombre más largo),
+    así que el coste depende de la longitud del texto y no del número de
+    lugares. En cada posición gana la coincidencia más larga ('Santiago de
+    Chile' frente a 'Chile', 'fuera de Málaga' frente a 'Málaga'). De todos
+    los lugares del texto, buscar devuelve el más específico (un municipio
+    antes que una provincia y esta antes que una región o un país: 'Málaga,
+    Spain' es Málaga) y, entre los igual de específicos, el último, porque las
+    direcciones acaban en la ciudad ('Hotel Faro, Marbella').
+
+    Las siglas se comparan con sus mayúsculas y los nombres de VIAS no
+    cuentan cuando van seguidos de 'de'/'del' (son el nombre de una calle).
+    """
+
+    def __init__(self, entradas: Iterable[Tuple[str, str, int]], siglas: Optional[Dict[str, str]] = None,
+                 vias: Iterable[str] = ()):
+        self._indice: Dict[Tuple[str, ...], Lugar] = {}
+        for nombre, zona, nivel in entradas:
+            clave = tuple(tokenizar(nombre))
+            # Si un nombre se repite manda la primera definición (Málaga antes que España)
+            if clave and clave not in self._indice:
+                self._indice[clave] = Lugar(nombre, zona, nivel)
+        self._siglas = {sigla: Lugar(sigla, zona, PAIS_O_REGION) for sigla, zona in (siglas or {}).items()}
+        self._vias = {tuple(tokenizar(via)) for via in vias}
+        self.max_palabras = max((len(clave) for clave in self._indice), default=0)
+        # Palabras con las que empieza algún lugar: el resto se descarta sin probar n-gramas
+        self._iniciales = {clave[0] for clave in self._indice}
+
+    @classmethod
+    def por_defecto(cls) -> "Gazetteer":
+        grupos = [
+            (FRASES, None, PAIS_O_REGION),
+            (MALAGA, "base", MUNICIPIO),
+            (MALAGA_COMARCAS, "base", PROVINCIA),
+            (ESPANA, "fuera_malaga", MUNICIPIO),
+            (ESPANA_PROVINCIAS, "fuera_malaga", PROVINCIA),
+            (ESPANA_REGIONES, "fuera_malaga", PAIS_O_REGION),
+            (EXTRANJERO, "fuera_espana", MUNICIPIO),
+            (EXTRANJERO_REGIONES, "fuera_espana", PROVINCIA),
+            (PAISES, "fuera_espana", PAIS_O_REGION),
+        ]
+        entradas = [
+            (nombre, zona or FRASES[nombre], nivel)
+            for nombres, zona, nivel in grupos
+            for nombre in nombres
+        ]
+        return cls(entradas, SIGLAS, VIAS)
+
+    def __len__(self) -> int:
+        return len(self._indice)
+
+    def _coincidencias(self, texto: str):
+        originales = _palabras_originales(texto)
+        palabras = [palabra.lower() for palabra in originales]
+        posicion = 0
+        while posicion < len(palabras):
+            sigla = self._siglas.get(originales[posicion])
+            if sigla is not None:
+                yield sigla
+                posicion += 1
+                continue
+            if palabras[posicion] not in self._iniciales:
+                posicion += 1
+                continue
+            for longitud in range(min(self.max_palabras, len(palabras) - posicion), 0, -1):
+                clave = tuple(palabras[posicion:posicion + longitud])
+                lugar = self._indice.get(clave)
+                if lugar is None:
+                    continue
+                siguiente = posicion + longitud
+                if clave in self._vias and siguiente < len(palabras) and palabras[siguiente] in ("de", "del"):
+                    continue
+                yield lugar
+                posicion = siguiente
+                break
+            else:
+                posicion += 1
+
+    def buscar(self, texto: str) -> Optional[Lugar]:
+        """Lugar más específico del texto (el último si hay varios igual de específicos), o None"""
+        mejor = None
+        for lugar in self._coincidencias(texto):
+            if mejor is None or lugar.nivel >= mejor.nivel:
+                mejor = lugar
+        return mejor
+
+    def lugares(self, texto: str) -> List[Lugar]:
+        """Todos los lugares conocidos del texto, en orden de aparición"""
+        return list(self._coincidencias(texto))
+
+    def zona(self, texto: str, por_defecto: str = "fuera_malaga") -> str:
+        """Tramo de precio de la localización (por_defecto si no se reconoce ningún lugar)"""
+        lugar = self.buscar(texto)
+        return lugar.zona if lugar else por_defecto
+
+
+gazetteer = Gazetteer.por_defecto()
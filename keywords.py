@@ -0,0 +1,162 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from catalog import DJCatalog, normalizar
+
+# Vocabulario de intenciones, ya sin acentos. Un '*' final acepta cualquier
+# terminación ('contrat*' -> contratar, contratación, contratarlo...).
+VOCABULARIO = {
+    # Intención clara de contratar
+    "contratar": ("contrat*", "booking", "book", "reserv*"),
+    "peticion": ("busco dj", "busco un dj", "necesito dj", "necesito un dj", "quiero dj", "quiero un dj",
+                 "dj para evento", "dj para fiesta"),
+    "evento": ("evento*", "fiesta*", "celebracion*"),
+    # Preguntas de precio de un evento concreto
+    "precio": ("precio*", "tarifa*", "cuanto cuesta", "cuesta", "costaria*", "coste", "cobra*"),
+    # Preguntas generales sobre el presupuesto
+    "presupuesto": ("caro", "barato", "economico", "presupuesto*", "cuanto"),
+    "disponibilidad": ("disponib*", "fecha*"),
+    "saludo": ("hola", "hi", "hello", "hey", "buenas", "buenos dias", "buenas tardes", "buenas noches",
+               "que tal"),
+    "despedida": ("adios", "hasta luego", "bye", "chao", "nos vemos"),
+    "gracias": ("gracias", "thank you", "thanks"),
+    "servicio": ("que haces", "quien eres", "servicio*"),
+    "estilo": ("musica", "genero", "estilo", "break beat", "breakbeat"),
+}
+
+# Alias de los artistas -> nombre con el que se guardan las contrataciones
+ALIAS_DJS = {
+    "brainkiller": "The Brainkiller",
+    "jose": "Jose Rodriguez",
+    "rodriguez": "Jose Rodriguez",
+    "tortu": "Tortu",
+    "aparicio": "V. Aparicio",
+    "wardian": "Wardian",
+}
+
+# Palabras de los nombres del catálogo que no sirven como alias por sí solas
+_PALABRAS_GENERICAS = {"the", "dj", "los", "las", "del", "mc"}
+
+
+@dataclass(frozen=True)
+class Coincidencia:
+    """Palabra clave encontrada en el mensaje"""
+    categoria: str
+    valor: Optional[str]
+    inicio: int
+    fin: int
+
+
+class KeywordMatcher:
+    """Autómata de Aho–Corasick sobre todas las palabras clave.
+
+    Las palabras se normalizan (minúsculas, sin acentos) al añadirlas y el
+    mensaje se normaliza una vez y se recorre un solo carácter cada vez, así
+    que el coste de buscar depende de la longitud del mensaje y no de cuántas
+    palabras clave haya. Solo cuentan coincidencias de palabras completas
+    ('hi' no aparece en 'hice'), salvo la terminación libre de las que acaban
+    en '*'.
+    """
+
+    def __init__(self):
+        self._hijos: List[Dict[str, int]] = [{}]
+        # Salidas propias de cada nodo: (categoria, valor, longitud, admite terminación)
+        self._propias: List[List[Tuple[str, Optional[str], int, bool]]] = [[]]
+        self._fallos: List[int] = [0]
+        self._salidas: List[List[Tuple[str, Optional[str], int, bool]]] = [[]]
+        self._compilado = True
+
+    @classmethod
+    def por_defecto(cls) -> "KeywordMatcher":
+        matcher = cls()
+        for categoria, palabras in VOCABULARIO.items():
+            matcher.add(categoria, palabras)
+        for alias, nombre in ALIAS_DJS.items():
+            matcher.add("dj", [alias], nombre)
+        return matcher
+
+    def add(self, categoria: str, palabras: Iterable[str], valor: Optional[str] = None) -> None:
+        """Añade palabras clave a una categoría (valor opcional, p. ej. el nombre del DJ)"""
+        for palabra in palabras:
+            clave = normalizar(palabra)
+            prefijo = clave.endswith("*")
+            clave = clave.rstrip("*").strip()
+            if not clave:
+                continue
+            nodo = 0
+            for caracter in clave:
+                siguiente = self._hijos[nodo].get(caracter)
+                if siguiente is None:
+                    siguiente = len(self._hijos)
+                    self._hijos.append({})
+                    self._propias.append([])
+                    self._hijos[nodo][caracter] = siguiente
+                nodo = siguiente
+            salida = (categoria, valor, len(clave), prefijo)
+            if salida not in self._propias[nodo]:
+                self._propias[nodo].append(salida)
+        self._compilado = False
+
+    def _compilar(self) -> None:
+        """Enlaces de fallo y salidas acumuladas, recorriendo el trie en anchura"""
+        self._fallos = [0] * len(self._hijos)
+        self._salidas = [list(propias) for propias in self._propias]
+        cola = deque(self._hijos[0].values())
+        while cola:
+            nodo = cola.popleft()
+            for caracter, hijo in self._hijos[nodo].items():
+                fallo = self._fallos[nodo]
+                while fallo and caracter not in self._hijos[fallo]:
+                    fallo = self._fallos[fallo]
+                destino = self._hijos[fallo].get(caracter, 0)
+                self._fallos[hijo] = destino if destino != hijo else 0
+                self._salidas[hijo].extend(self._salidas[self._fallos[hijo]])
+                cola.append(hijo)
+        self._compilado = True
+
+    def buscar(self, texto: str) -> List[Coincidencia]:
+        """Todas las palabras clave del texto, en orden de aparición"""
+        if not self._compilado:
+            self._compilar()
+        texto = normalizar(texto)
+        hijos, fallos, salidas = self._hijos, self._fallos, self._salidas
+        coincidencias = []
+        nodo = 0
+        for posicion, caracter in enumerate(texto):
+            while nodo and caracter not in hijos[nodo]:
+                nodo = fallos[nodo]
+            nodo = hijos[nodo].get(caracter, 0)
+            if not salidas[nodo]:
+                continue
+            fin = posicion + 1
+            termina_palabra = fin == len(texto) or not texto[fin].isalnum()
+            for categoria, valor, longitud, prefijo in salidas[nodo]:
+                inicio = fin - longitud
+                if (inicio == 0 or not texto[inicio - 1].isalnum()) and (prefijo or termina_palabra):
+                    coincidencias.append(Coincidencia(categoria, valor, inicio, fin))
+        coincidencias.sort(key=lambda coincidencia: coincidencia.inicio)
+        return coincidencias
+
+    def categorias(self, texto: str) -> Set[str]:
+        """Categorías presentes en el texto"""
+        return {coincidencia.categoria for coincidencia in self.buscar(texto)}
+
+    def dj(self, texto: str) -> Optional[str]:
+        """Primer artista mencionado en el texto, o None"""
+        for coincidencia in self.buscar(texto):
+            if coincidencia.categoria == "dj":
+                return coincidencia.valor
+        return None
+
+    def registrar_artistas(self, catalog: DJCatalog) -> None:
+        """Añade como alias el nombre y las palabras distintivas de los artistas que aún no se reconocen"""
+        for artista in catalog:
+            if self.dj(artista.nombre):
+                continue
+            palabras = [palabra for palabra in artista.clave.replace(".", " ").split()
+                        if len(palabra) >= 4 and palabra not in _PALABRAS_GENERICAS]
+            self.add("dj", [artista.clave] + palabras, artista.nombre)
+
+
+palabras_clave = KeywordMatcher.por_defecto()
@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+class LLMResponseCache:
+    """Caché de respuestas de OpenAI con TTL y expulsión LRU.
+
+    Tiene un nivel en memoria y, opcionalmente, un nivel en SQLite que
+    sobrevive a reinicios y se comparte entre workers. Las entradas llevan la
+    versión del catálogo con la que se generaron: al cambiar el catálogo se
+    descartan todas las anteriores. Desde código asíncrono se usan get_async
+    y set_async, que llevan el nivel SQLite a un hilo propio.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 3600, sqlite_path: str = ""):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.sqlite_path = sqlite_path
+        self.version = ""
+        self._memoria: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-cache") if sqlite_path else None
+
+        if self.sqlite_path:
+            try:
+                with self._conectar() as conn:
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS llm_cache (
+                            clave TEXT PRIMARY KEY,
+                            respuesta TEXT NOT NULL,
+                            expira REAL NOT NULL,
+                            version TEXT NOT NULL
+                        )
+                    """)
+            except sqlite3.Error as e:
+                print(f"[WARNING] Caché SQLite de OpenAI deshabilitada: {e}")
+                self.sqlite_path = ""
+
+    @contextmanager
+    def _conectar(self):
+        conn = sqlite3.connect(self.sqlite_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict], artist: Optional[str] = None) -> str:
+        """Clave (modelo, hash del prompt, artista)"""
+        prompt_hash = hashlib.sha256(
+            json.dumps(messages, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        return f"{model}:{artist or '-'}:{prompt_hash}"
+
+    def set_version(self, version: str) -> None:
+        """Fija la versión del catálogo e invalida lo cacheado con otra versión"""
+        with self._lock:
+            if version == self.version:
+                return
+            self.version = version
+            self._memoria.clear()
+        if self.sqlite_path:
+            try:
+                with self._conectar() as conn:
+                    conn.execute("DELETE FROM llm_cache WHERE version != ?", (version,))
+            except sqlite3.Error as e:
+                print(f"[WARNING] Error invalidando la caché de OpenAI: {e}")
+
+    def _leer_memoria(self, key: str, ahora: float) -> Optional[str]:
+        with self._lock:
+            entrada = self._memoria.get(key)
+            if entrada is not None:
+                expira, respuesta = entrada
+                if expira > ahora:
+                    self._memoria.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return respuesta
+                del self._memoria[key]
+        return None
+
+    def _leer_sqlite(self, key: str, ahora: float) -> Optional[str]:
+        if self.sqlite_path:
+            try:
+                with self._conectar() as conn:
+                    fila = conn.execute(
+                        "SELECT respuesta, expira FROM llm_cache WHERE clave = ? AND version = ? AND expira > ?",
+                        (key, self.version, ahora)
+                    ).fetchone()
+                if fila:
+                    self._guardar_en_memoria(key, fila[0], fila[1])
+                    with self._lock:
+                        self.stats["hits"] += 1
+                    return fila[0]
+            except sqlite3.Error as e:
+                print(f"[WARNING] Error leyendo la caché de OpenAI: {e}")
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def _escribir_sqlite(self, key: str, respuesta: str, expira: float) -> None:
+        try:
+            with self._conectar() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (clave, respuesta, expira, version) VALUES (?, ?, ?, ?)",
+                    (key, respuesta, expira, self.version)
+                )
+        except sqlite3.Error as e:
+            print(f"[WARNING] Error escribiendo la caché de OpenAI: {e}")
+
+    def get(self, key: str) -> Optional[str]:
+        ahora = time.time()
+        respuesta = self._leer_memoria(key, ahora)
+        if respuesta is not None:
+            return respuesta
+        return self._leer_sqlite(key, ahora)
+
+    def set(self, key: str, respuesta: str) -> None:
+        expira = time.time() + self.ttl
+        self._guardar_en_memoria(key, respuesta, expira)
+        if self.sqlite_path:
+            self._escribir_sqlite(key, respuesta, expira)
+
+    async def get_async(self, key: str) -> Optional[str]:
+        """Como get, pero la consulta a SQLite no bloquea el event loop"""
+        ahora = time.time()
+        respuesta = self._leer_memoria(key, ahora)
+        if respuesta is not None:
+            return respuesta
+        if not self.sqlite_path:
+            return self._leer_sqlite(key, ahora)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._leer_sqlite, key, ahora)
+
+    async def set_async(self, key: str, respuesta: str) -> None:
+        """Como set, pero la escritura en SQLite no bloquea el event loop"""
+        expira = time.time() + self.ttl
+        self._guardar_en_memoria(key, respuesta, expira)
+        if self.sqlite_path:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self._escribir_sqlite, key, respuesta, expira)
+
+    def _guardar_en_memoria(self, key: str, respuesta: str, expira: float) -> None:
+        with self._lock:
+            self._memoria[key] = (expira, respuesta)
+            self._memoria.move_to_end(key)
+            while len(self._memoria) > self.max_entries:
+                self._memoria.popitem(last=False)
+                self.stats["evictions"] += 1
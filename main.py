@@ -1,22 +1,57 @@
 import PyPDF2
 import os
 import glob
-import sqlite3
 import datetime
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from catalog import DJCatalog, formatear_euros, normalizar
+from db import bookings_db
+from bookings_repository import bookings
+from fechas import parsear_fecha, rango_fechas
+from pdf_cache import PDFTextCache
+from pricing import NOMBRES_ZONAS, PricingEngine, buscar_horas
+from gazetteer import gazetteer
+from keywords import palabras_clave
+from artist_resolver import artistas
+from search_index import SentenceIndex
+
+# Caché del texto extraído de los PDFs (PDF_CACHE_PATH vacío la deshabilita)
+cache_pdf = PDFTextCache(os.getenv("PDF_CACHE_PATH", ".pdf_cache.db"))
+
+# Extracción en paralelo: número de procesos (1 = secuencial) y páginas por tarea
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "1"))
+PDF_PAGINAS_POR_TAREA = int(os.getenv("PDF_PAGINAS_POR_TAREA", "20"))
+# Máximo de días que se pueden consultar de una vez en la búsqueda de disponibilidad
+MAX_DIAS_DISPONIBILIDAD = int(os.getenv("MAX_DIAS_DISPONIBILIDAD", "366"))
+
+def _extraer_paginas(nombre_archivo, inicio, fin=None):
+    """Extrae el texto de un rango de páginas (hasta el final si fin es None)"""
+    with open(nombre_archivo, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        fin = len(reader.pages) if fin is None else fin
+        return [reader.pages[i].extract_text() or "" for i in range(inicio, fin)]
+
+def _contar_paginas(nombre_archivo):
+    with open(nombre_archivo, 'rb') as f:
+        return len(PyPDF2.PdfReader(f).pages)
 
 def leer_archivo(nombre_archivo):
     """Lee un archivo de texto o PDF"""
     if nombre_archivo.lower().endswith('.pdf'):
+        # Reutilizar el texto ya extraído si el PDF no ha cambiado
+        texto = cache_pdf.get(nombre_archivo)
+        if texto is not None:
+            return texto
         try:
-            with open(nombre_archivo, 'rb') as f:
-                reader = PyPDF2.PdfReader(f)
-                texto = ""
-                for page in reader.pages:
-                    texto += page.extract_text() or ""
-                return texto if texto else "No se pudo extraer texto del PDF."
+            texto = "".join(_extraer_paginas(nombre_archivo, 0))
         except Exception as e:
             return f"Error al leer el PDF: {e}"
+        if not texto:
+            return "No se pudo extraer texto del PDF."
+        cache_pdf.put(nombre_archivo, texto)
+        return texto
     else:
         try:
             with open(nombre_archivo, 'r', encoding='utf-8') as f:
@@ -26,38 +61,27 @@ def leer_archivo(nombre_archivo):
         
 # ... tu función leer_archivo() arriba ...
 
+@lru_cache(maxsize=8)
+def indice_de_texto(texto):
+    """Índice de oraciones del texto (se construye una vez por texto cargado)"""
+    return SentenceIndex.from_text(texto)
+
+@lru_cache(maxsize=8)
+def motor_de_precios(texto):
+    """Tarifas de los DJs parseadas una sola vez por cada texto de datos"""
+    return PricingEngine.from_catalog(DJCatalog.from_text(texto))
+
 def buscar_en_texto(texto, pregunta):
     """Busca información relevante en el texto para responder una pregunta"""
     if not texto or len(texto.strip()) == 0:
         return "No hay texto para analizar."
     
-    # Convertir a minúsculas para búsqueda
-    texto_lower = texto.lower()
-    pregunta_lower = pregunta.lower()
-    
-    # Palabras clave de la pregunta
-    palabras_pregunta = pregunta_lower.split()
-    palabras_relevantes = [p for p in palabras_pregunta if len(p) > 2]
+    # Las 3 oraciones con mejor puntuación BM25
+    mejores_oraciones = indice_de_texto(texto).buscar(pregunta, k=3)
     
-    # Dividir texto en oraciones
-    oraciones = texto.replace('\n', ' ').split('.')
-    oraciones = [o.strip() for o in oraciones if len(o.strip()) > 10]
-    
-    # Buscar oraciones que contengan palabras clave
-    oraciones_relevantes = []
-    for oracion in oraciones:
-        oracion_lower = oracion.lower()
-        coincidencias = sum(1 for palabra in palabras_relevantes if palabra in oracion_lower)
-        if coincidencias > 0:
-            oraciones_relevantes.append((oracion, coincidencias))
-    
-    if not oraciones_relevantes:
+    if not mejores_oraciones:
         return "No encontré información específica sobre esa pregunta en el PDF."
     
-    # Ordenar por relevancia y tomar las mejores
-    oraciones_relevantes.sort(key=lambda x: x[1], reverse=True)
-    mejores_oraciones = [o[0] for o in oraciones_relevantes[:3]]
-    
     return '. '.join(mejores_oraciones) + '.'
 
 def preguntar_pdf(nombre_archivo):
@@ -85,75 +109,162 @@ def preguntar_pdf(nombre_archivo):
     
     return "Sesión de preguntas terminada.", None
 
-def cargar_pdfs_directorio():
+def cargar_pdfs_directorio(workers=None):
     """Carga automáticamente todos los PDFs del directorio actual"""
     directorio_actual = os.getcwd()
     archivos_pdf = glob.glob(os.path.join(directorio_actual, "*.pdf"))
+    workers = PDF_WORKERS if workers is None else workers
+    
+    if workers > 1 and archivos_pdf:
+        contenidos = leer_pdfs_en_paralelo(archivos_pdf, workers)
+    else:
+        contenidos = {}
+        for archivo_pdf in archivos_pdf:
+            inicio = time.perf_counter()
+            contenidos[archivo_pdf] = (leer_archivo(archivo_pdf), time.perf_counter() - inicio)
     
     pdfs_cargados = {}
     for archivo_pdf in archivos_pdf:
         nombre_archivo = os.path.basename(archivo_pdf)
-        contenido = leer_archivo(archivo_pdf)
+        contenido, segundos = contenidos[archivo_pdf]
         
         if not contenido.startswith("Error"):
             pdfs_cargados[nombre_archivo] = contenido
-            print(f"[OK] PDF cargado: {nombre_archivo}")
+            print(f"[OK] PDF cargado: {nombre_archivo} ({segundos:.2f}s)")
         else:
             print(f"[ERROR] Error cargando: {nombre_archivo}")
     
     return pdfs_cargados
 
+def leer_pdfs_en_paralelo(archivos_pdf, workers):
+    """Extrae varios PDFs repartiendo ficheros y rangos de páginas en un pool de procesos.
+    
+    Devuelve {ruta: (texto, segundos)}, donde segundos es el tiempo hasta que
+    el último rango de páginas de ese fichero estuvo listo.
+    """
+    inicio = time.perf_counter()
+    resultados = {}
+    tareas = {}
+    terminado = {}
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for archivo_pdf in archivos_pdf:
+            texto = cache_pdf.get(archivo_pdf)
+            if texto is not None:
+                resultados[archivo_pdf] = (texto, time.perf_counter() - inicio)
+                continue
+            try:
+                paginas = _contar_paginas(archivo_pdf)
+            except Exception as e:
+                resultados[archivo_pdf] = (f"Error al leer el PDF: {e}", 0.0)
+                continue
+            tareas[archivo_pdf] = [
+                pool.submit(_extraer_paginas, archivo_pdf, desde, min(desde + PDF_PAGINAS_POR_TAREA, paginas))
+                for desde in range(0, paginas, PDF_PAGINAS_POR_TAREA)
+            ]
+            for futuro in tareas[archivo_pdf]:
+                futuro.add_done_callback(lambda f: terminado.__setitem__(f, time.perf_counter()))
+        
+        for archivo_pdf, futuros in tareas.items():
+            try:
+                texto = "".join(pagina for futuro in futuros for pagina in futuro.result())
+            except Exception as e:
+                resultados[archivo_pdf] = (f"Error al leer el PDF: {e}", time.perf_counter() - inicio)
+                continue
+            # Un PDF sin páginas no tiene tareas: está listo desde el principio
+            segundos = max((terminado.get(futuro, time.perf_counter()) for futuro in futuros), default=inicio) - inicio
+            if texto:
+                cache_pdf.put(archivo_pdf, texto)
+            else:
+                texto = "No se pudo extraer texto del PDF."
+            resultados[archivo_pdf] = (texto, segundos)
+    
+    return resultados
+
 def inicializar_base_datos():
     """Inicializa la base de datos SQLite"""
-    conn = sqlite3.connect('contrataciones.db')
-    cursor = conn.cursor()
+    conn = bookings_db.connection()
+    
+    # Bases de datos antiguas: añadir las columnas nuevas antes de crear sus índices
+    bookings.migrar_esquema()
     
     # Leer y ejecutar el archivo SQL
     with open('contrataciones.sql', 'r', encoding='utf-8') as f:
         sql_content = f.read()
-        cursor.executescript(sql_content)
+        conn.executescript(sql_content)
     
     conn.commit()
-    conn.close()
-
-def verificar_disponibilidad(dj_nombre, fecha_evento):
-    """Verifica si un DJ está disponible en una fecha específica"""
-    conn = sqlite3.connect('contrataciones.db')
-    cursor = conn.cursor()
     
-    cursor.execute("""
-        SELECT COUNT(*) FROM contrataciones 
-        WHERE dj_nombre = ? AND fecha_evento = ? AND estado = 'confirmada'
-    """, (dj_nombre, fecha_evento))
+    if bookings.reconstruir_estadisticas():
+        print("[OK] Estadísticas de contrataciones recalculadas")
+    
+    claves = bookings.rellenar_dj_clave()
+    if claves:
+        print(f"[OK] Nombre de DJ normalizado en {claves} contrataciones existentes")
     
-    resultado = cursor.fetchone()[0]
-    conn.close()
+    rellenadas = bookings.rellenar_fecha_iso()
+    if rellenadas:
+        print(f"[OK] Fecha normalizada en {rellenadas} contrataciones existentes")
     
-    return resultado == 0  # True si está disponible (no hay contrataciones)
+    confirmadas = bookings.cargar_calendario()
+    print(f"[OK] Calendario de disponibilidad: {confirmadas} contrataciones confirmadas")
+
+def verificar_disponibilidad(dj_nombre, fecha_evento):
+    """Verifica si un DJ está disponible en una fecha específica"""
+    return bookings.disponible(dj_nombre, fecha_evento)  # True si no hay contrataciones
 
 def guardar_contratacion(dj, datos, precio_total):
-    """Guarda una contratación en la base de datos"""
-    conn = sqlite3.connect('contrataciones.db')
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        INSERT INTO contrataciones 
-        (dj_nombre, cliente_nombre, cliente_telefono, cliente_email, 
-         localizacion, fecha_evento, duracion, precio_total)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        dj,
-        datos['nombre'],
-        datos['telefono'],
-        datos['email'],
-        datos['localizacion'],
-        datos['fecha'],
-        datos['duracion'],
-        precio_total
-    ))
-    
-    conn.commit()
-    conn.close()
+    """Guarda una contratación en la base de datos (False si la fecha ya está ocupada)"""
+    return bookings.guardar(dj, datos, precio_total)
+
+def preparar_consulta_disponibilidad(catalogo, desde, hasta, djs=None):
+    """Valida el rango y los DJs de una consulta de disponibilidad.
+
+    Devuelve (desde, hasta, djs) con las fechas parseadas y los nombres
+    canónicos del catálogo; lanza ValueError si algo no es válido.
+    """
+    fecha_desde = parsear_fecha(desde)
+    fecha_hasta = parsear_fecha(hasta)
+    if fecha_desde is None or fecha_hasta is None:
+        raise ValueError("Fecha no reconocida")
+    if fecha_hasta < fecha_desde:
+        raise ValueError("La fecha final es anterior a la inicial")
+    if (fecha_hasta - fecha_desde).days >= MAX_DIAS_DISPONIBILIDAD:
+        raise ValueError(f"El rango no puede superar {MAX_DIAS_DISPONIBILIDAD} días")
+    
+    if not djs:
+        return fecha_desde, fecha_hasta, catalogo.nombres()
+    nombres = []
+    for dj in djs:
+        artista = catalogo.get(dj)
+        if artista is None:
+            raise ValueError(f"DJ desconocido: {dj}")
+        nombres.append(artista.nombre)
+    return fecha_desde, fecha_hasta, nombres
+
+def matriz_disponibilidad(fechas, djs, ocupadas):
+    """Matriz compacta libre/ocupado: una cadena por DJ con '1' = libre y '0' = ocupado"""
+    libre = {
+        dj: "".join("0" if fecha in ocupadas.get(dj, ()) else "1" for fecha in fechas)
+        for dj in djs
+    }
+    return {
+        "fechas": [fecha.isoformat() for fecha in fechas],
+        "djs": djs,
+        "libre": libre,
+        # Días en los que al menos un DJ está libre
+        "con_huecos": [
+            fecha.isoformat() for i, fecha in enumerate(fechas)
+            if any(fila[i] == "1" for fila in libre.values())
+        ],
+    }
+
+def disponibilidad_rango(catalogo, desde, hasta, djs=None, solo_fines_de_semana=False):
+    """Disponibilidad de varios DJs en un rango de fechas (todos los del catálogo si djs es None)"""
+    fecha_desde, fecha_hasta, djs = preparar_consulta_disponibilidad(catalogo, desde, hasta, djs)
+    ocupadas = bookings.ocupacion(djs, fecha_desde, fecha_hasta)
+    fechas = rango_fechas(fecha_desde, fecha_hasta, solo_fines_de_semana)
+    return matriz_disponibilidad(fechas, djs, ocupadas)
 
 def manager_dj_booking():
     """Manager de DJs que sigue exactamente las instrucciones del prompt PDF"""
@@ -187,6 +298,12 @@ def manager_dj_booking():
         print("Error: No se encontraron los archivos necesarios")
         return
     
+    # Parsear el catálogo de DJs y construir el índice de búsqueda una sola vez
+    catalogo = DJCatalog.from_text(djs_database)
+    indice_de_texto(djs_database)
+    palabras_clave.registrar_artistas(catalogo)
+    artistas.registrar_artistas(catalogo)
+    
     print("\nSoy el mejor manager de DJs especializado en contratacion de artistas.")
     print("Estoy aqui para ayudarte con tu booking. Escribe 'salir' para terminar.\n")
     
@@ -212,14 +329,14 @@ def manager_dj_booking():
             continue
         
         # Detectar intención de contratación según el prompt
-        palabras_booking = ["contratar", "booking", "book", "contratación", "quiero contratar", "me gustaría contratar", "necesito contratar"]
+        categorias = palabras_clave.categorias(pregunta)
         
-        if any(palabra in pregunta.lower() for palabra in palabras_booking):
+        if "contratar" in categorias:
             print("\n¡Perfecto! Te muestro todos los DJs que tenemos disponibles con toda su informacion:")
             print("=" * 70)
             
             # Mostrar TODA la información exacta del archivo de datos
-            mostrar_todos_los_djs(djs_database)
+            mostrar_todos_los_djs(catalogo)
             
             print("=" * 70)
             print("\n¿Cual de estos artistas te interesa contratar?")
@@ -249,7 +366,7 @@ def manager_dj_booking():
                 continue
             
         # Si menciona un DJ específico después de ver la lista
-        elif dj_seleccionado is None and any(dj in pregunta.lower() for dj in ["brainkiller", "jose", "rodriguez", "tortu", "aparicio", "wardian"]):
+        elif dj_seleccionado is None and "dj" in categorias:
             dj_seleccionado = extraer_nombre_dj(pregunta)
             print(f"\n¡Excelente eleccion! Has seleccionado a {dj_seleccionado}")
             print("Para cerrar la contratacion necesito los siguientes datos obligatorios:")
@@ -279,38 +396,89 @@ def manager_dj_booking():
             informacion = buscar_en_texto(djs_database, pregunta)
             print(f"\nBasandome en nuestra base de datos: {informacion}")
 
-def mostrar_todos_los_djs(database):
+def mostrar_todos_los_djs(catalogo):
     """Muestra toda la información de los DJs sin resumir ni parafrasear"""
-    lineas = database.split('\n')
-    dj_info = ""
-    
-    for linea in lineas:
-        linea = linea.strip()
-        if linea.startswith("NOMBRE:"):
-            if dj_info:
-                print(dj_info)
-                print("-" * 50)
-            dj_info = linea + "\n"
-        elif linea and not linea.startswith("CHATBOT") and not linea.startswith("ARTISTAS:") and not linea.startswith("INGRESOS") and not linea.startswith("PRESS"):
-            dj_info += linea + "\n"
-    
-    if dj_info:
-        print(dj_info)
+    print(catalogo.listing)
 
 def extraer_nombre_dj(pregunta):
-    """Extrae el nombre del DJ de la pregunta"""
-    pregunta_lower = pregunta.lower()
-    if "brainkiller" in pregunta_lower:
-        return "The Brainkiller"
-    elif "jose" in pregunta_lower or "rodriguez" in pregunta_lower:
-        return "Jose Rodriguez"
-    elif "tortu" in pregunta_lower:
-        return "Tortu"
-    elif "aparicio" in pregunta_lower:
-        return "V. Aparicio"
-    elif "wardian" in pregunta_lower:
-        return "Wardian"
-    return "DJ seleccionado"
+    """Extrae el nombre del DJ de la pregunta (tolerando erratas si no aparece tal cual)"""
+    return palabras_clave.dj(pregunta) or artistas.resolver(pregunta) or "DJ seleccionado"
+
+_LOCALIZACION_PRESUPUESTO = re.compile(
+    r"\ben\s+([^\W\d_][^,.;:?!¿¡\d]*?)\s*(?=$|[,.;:?!]|\s(?:por|durante|con|para|y)\s|\d)",
+    re.IGNORECASE
+)
+
+def extraer_consulta_presupuesto(pregunta):
+    """Detecta preguntas de presupuesto ('¿cuánto costaría 4 horas en Lisboa?').
+    
+    Devuelve un dict con localizacion, duracion y djs (None = todos) si la
+    pregunta es de precio e indica al menos la localización o la duración.
+    Solo cuentan como localización los lugares que reconoce el gazetteer
+    ('en diciembre' o 'en mi boda' no lo son); si no se indica ninguno se
+    presupuesta con la tarifa de Málaga y se pide la localización.
+    """
+    if not palabras_clave.categorias(pregunta) & {"precio", "presupuesto"}:
+        return None
+    
+    texto = normalizar(pregunta)
+    
+    horas = buscar_horas(texto)
+    # Primero lo que va tras "en ..." ("4 horas en Lisboa"), y si no es un lugar
+    # conocido cualquier lugar del mensaje ("¿precio para Lisboa?")
+    lugar = None
+    for candidato in _LOCALIZACION_PRESUPUESTO.finditer(pregunta):
+        lugar = gazetteer.buscar(candidato.group(1))
+        if lugar:
+            break
+    else:
+        lugar = gazetteer.buscar(pregunta)
+    if not horas and not lugar:
+        return None
+    
+    dj = extraer_nombre_dj(pregunta)
+    return {
+        "localizacion": lugar.nombre if lugar else "Málaga",
+        "localizacion_indicada": lugar is not None,
+        "duracion": f"{horas} horas" if horas else "1 hora",
+        "djs": [dj] if dj != "DJ seleccionado" else None,
+    }
+
+def responder_presupuesto(motor, consulta):
+    """Presupuesto de uno o de todos los DJs para la consulta, en texto para el cliente"""
+    presupuestos = motor.quote_all(consulta["localizacion"], consulta["duracion"], consulta["djs"])
+    if not presupuestos:
+        return None
+    
+    primero = presupuestos[0]
+    horas = f"{primero.horas} hora{'s' if primero.horas != 1 else ''}"
+    indicada = consulta.get("localizacion_indicada", True)
+    lugar = f" en {consulta['localizacion']}" if indicada else ""
+    response = f"Presupuesto para {horas}{lugar} (tarifa {NOMBRES_ZONAS[primero.zona]}):\n\n"
+    for presupuesto in sorted(presupuestos, key=lambda p: p.total):
+        response += f"• {presupuesto.dj}: {formatear_euros(presupuesto.total)}\n"
+    
+    if primero.horas_extra:
+        response += f"\nIncluye {primero.horas_extra}h adicional{'es' if primero.horas_extra != 1 else ''} a {primero.precio_hora_extra}€/hora."
+    if primero.zona != "base":
+        response += "\nNo incluye hotel, desplazamiento y comida."
+    if not indicada:
+        response += "\n\n¿Dónde será el evento? Fuera de Málaga el precio cambia."
+    response += "\n\n¿Te gustaría contratar a alguno? Dime su nombre."
+    return response
+
+def responder_rangos_precio(motor):
+    """Precio de partida de cada DJ (tarifa de Málaga) y reglas generales, desde las tarifas del PDF"""
+    tabla = motor.tabla("base")
+    if not tabla:
+        return ("El precio depende del DJ, la localización y la duración del evento. 💰\n\n"
+                "Dime dónde y cuántas horas y te preparo un presupuesto.")
+    response = "Te explico nuestros rangos de precios: 💰\n\n"
+    for nombre, precio in sorted(tabla.items(), key=lambda item: item[1]):
+        response += f"• {nombre}: desde {formatear_euros(precio)}\n"
+    response += "\n" + "\n".join(regla.lstrip("- ") for regla in motor.reglas()) + "\n\n"
+    response += "¿Te interesa alguno en particular?"
+    return response
 
 def recopilar_datos_evento(datos, respuesta, dj_nombre=None):
     """Recopila los datos del evento paso a paso"""
@@ -341,6 +509,12 @@ def recopilar_datos_evento(datos, respuesta, dj_nombre=None):
     
     return True  # Indica que el campo se completó correctamente
 
+# Sin tarifas cargadas (ni la del DJ ni la del DJ por defecto) no se puede cerrar la contratación
+MENSAJE_SIN_TARIFA = (
+    "No hemos podido calcular el precio de {dj} en este momento, asi que la contratacion "
+    "no se ha guardado. Por favor, intentalo de nuevo mas tarde."
+)
+
 def finalizar_contratacion(dj, datos, database):
     """Finaliza la contratación con desglose de precio"""
     print(f"\n¡Excelente! He recogido todos los datos para contratar a {dj}")
@@ -358,50 +532,15 @@ def finalizar_contratacion(dj, datos, database):
     # Calcular precio basado en datos reales del PDF
     print("\nDESGLOSE DEL PRECIO:")
     
-    # Precios exactos del PDF - CACHÉ BASE (1 hora)
-    precios_djs = {
-        "The Brainkiller": {"base": 1600, "fuera_malaga": 1800, "fuera_espana": 2500},
-        "Jose Rodriguez": {"base": 1000, "fuera_malaga": 1200, "fuera_espana": 1900},
-        "Tortu": {"base": 1200, "fuera_malaga": 1400, "fuera_espana": 2100},
-        "V. Aparicio": {"base": 600, "fuera_malaga": 800, "fuera_espana": 1500},
-        "Wardian": {"base": 600, "fuera_malaga": 800, "fuera_espana": 1500}
-    }
-    
-    # Obtener precios del DJ seleccionado
-    precios_dj = precios_djs.get(dj, precios_djs["V. Aparicio"])
-    
-    # Determinar precio base según localización
-    localizacion = datos['localizacion'].lower()
-    
-    if "málaga" in localizacion or "malaga" in localizacion:
-        precio_base = precios_dj["base"]
-        print(f"Caché base {dj} (Málaga): {precio_base}€")
-    elif any(pais in localizacion for pais in ["francia", "portugal", "italia", "alemania", "reino unido", "uk", "france", "germany", "italy"]) or "fuera de españa" in localizacion:
-        precio_base = precios_dj["fuera_espana"]
-        print(f"Caché {dj} fuera de España: {precio_base}€")
-        print("(No incluido hotel, desplazamiento y comida)")
-    else:
-        precio_base = precios_dj["fuera_malaga"]
-        print(f"Caché {dj} fuera de Málaga: {precio_base}€")
-        print("(No incluido hotel, desplazamiento y comida)")
-    
-    # Calcular horas adicionales (según PDF: +300€ por cada hora añadida)
-    duracion_texto = datos['duracion'].lower()
-    horas = 1  # Caché base = 1 hora según PDF
-    
-    if 'hora' in duracion_texto:
-        numeros = re.findall(r'\d+', duracion_texto)
-        if numeros:
-            horas = int(numeros[0])
-    
-    precio_horas_extra = 0
-    if horas > 1:
-        horas_extra = horas - 1
-        precio_horas_extra = horas_extra * 300  # 300€ por hora según PDF
-        print(f"Horas adicionales ({horas_extra}h x 300€): +{precio_horas_extra}€")
+    presupuesto = motor_de_precios(database).quote(dj, datos['localizacion'], datos['duracion'])
+    if presupuesto is None:
+        print(MENSAJE_SIN_TARIFA.format(dj=dj))
+        return
+    for linea in presupuesto.desglose():
+        print(linea)
     
     # Cálculo final
-    precio_total = precio_base + precio_horas_extra
+    precio_total = presupuesto.total
     
     print("-" * 40)
     print(f"TOTAL: {precio_total}€")
@@ -414,7 +553,10 @@ def finalizar_contratacion(dj, datos, database):
     print("https://www.funndarkbookings/presskits.com")
     
     # Guardar la contratación en la base de datos
-    guardar_contratacion(dj, datos, precio_total)
+    if not guardar_contratacion(dj, datos, precio_total):
+        print(f"\n❌ Lo siento, {dj} acaba de ser contratado para el {datos['fecha']}.")
+        print("La contratación no se ha guardado. Por favor, empieza de nuevo con otra fecha.")
+        return
     print(f"\n✅ Contratación guardada correctamente en el sistema")
     
     print(f"\n¡Gracias por confiar en nosotros para tu evento con {dj}!")
@@ -1,38 +1,120 @@
 import os
+import asyncio
 import openai
 from dotenv import load_dotenv
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, List, Optional
 import json
+from catalog import DJCatalog
+from context_selector import ContextSelector
+from llm_cache import LLMResponseCache
+from pricing import PricingEngine
+from gazetteer import gazetteer
+from keywords import palabras_clave
+from artist_resolver import artistas
 
 # Cargar variables de entorno
 load_dotenv()
 
+# Se añade al final de una respuesta en streaming que falla a medias
+RESPUESTA_INTERRUMPIDA = "\n\n[Respuesta interrumpida por un error técnico. ¿Podrías repetir tu pregunta?]"
+
 class OpenAIHandler:
     def __init__(self):
-        self.client = openai.OpenAI(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            base_url=os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
-        )
+        api_key = os.getenv("OPENAI_API_KEY")
+        base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+        
+        # Timeout por llamada (segundos) y máximo de peticiones simultáneas a la API
+        self.timeout = float(os.getenv("OPENAI_TIMEOUT", "30"))
+        self.max_concurrency = int(os.getenv("OPENAI_MAX_CONCURRENCY", "20"))
+        # Confianza mínima para resolver la intención localmente sin llamar a OpenAI
+        self.intent_threshold = float(os.getenv("INTENT_LOCAL_THRESHOLD", "0.85"))
+        self.intent_stats = {"local": 0, "llm": 0}
+        # Presupuesto de tokens para el contexto de DJs que se envía en cada llamada
+        self.context_tokens = int(os.getenv("OPENAI_CONTEXT_TOKENS", "1500"))
+        
+        self.client = openai.OpenAI(api_key=api_key, base_url=base_url, timeout=self.timeout)
+        # Cliente asíncrono para no bloquear el event loop de FastAPI
+        self.async_client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=self.timeout)
         self.model = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+        self._semaphore = None
+        self.catalog: Optional[DJCatalog] = None
+        self.pricing: Optional[PricingEngine] = None
+        self.selector: Optional[ContextSelector] = None
+        # Caché de respuestas deterministas (intención, fichas de artista)
+        self.cache = LLMResponseCache(
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512")),
+            ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+            sqlite_path=os.getenv("LLM_CACHE_PATH", "")
+        )
+    
+    def set_catalog(self, catalog: DJCatalog, pricing: Optional[PricingEngine] = None) -> None:
+        """Catálogo de DJs ya parseado y sus tarifas (se fijan al arrancar la aplicación)"""
+        self.catalog = catalog
+        self.pricing = pricing or PricingEngine.from_catalog(catalog)
+        self.selector = ContextSelector(catalog, self.context_tokens)
+        self.cache.set_version(catalog.version)
+    
+    def _get_selector(self, djs_database: str) -> ContextSelector:
+        """Selector de contexto del catálogo cargado (o del texto recibido)"""
+        if self.selector is not None:
+            return self.selector
+        return ContextSelector(DJCatalog.from_text(djs_database), self.context_tokens)
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Limitador de peticiones en vuelo (se crea dentro del event loop)"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+    
+    def _create_cached(self, messages: List[Dict], temperature: float, max_tokens: int,
+                       artist: Optional[str] = None) -> str:
+        """Llamada síncrona a la API pasando por la caché de respuestas"""
+        key = self.cache.make_key(self.model, messages, artist)
+        content = self.cache.get(key)
+        if content is None:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            content = response.choices[0].message.content
+            self.cache.set(key, content)
+        return content
+    
+    async def _create_cached_async(self, messages: List[Dict], temperature: float, max_tokens: int,
+                                   artist: Optional[str] = None) -> str:
+        """Llamada asíncrona a la API pasando por la caché de respuestas"""
+        key = self.cache.make_key(self.model, messages, artist)
+        content = await self.cache.get_async(key)
+        if content is None:
+            content = await self._create_async(messages, temperature, max_tokens)
+            await self.cache.set_async(key, content)
+        return content
+    
+    async def _create_async(self, messages: List[Dict], temperature: float, max_tokens: int) -> str:
+        """Llamada asíncrona a la API respetando el límite de concurrencia y el timeout"""
+        async with self._get_semaphore():
+            response = await asyncio.wait_for(
+                self.async_client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens
+                ),
+                timeout=self.timeout
+            )
+        return response.choices[0].message.content
         
-    def get_system_prompt(self, djs_database: str) -> str:
-        """Genera el prompt del sistema con información de los DJs"""
+    def get_system_prompt(self, dj_context: str) -> str:
+        """Genera el prompt del sistema con la información de DJs seleccionada"""
+        reglas_precios = "\n".join((self.pricing or PricingEngine({})).reglas())
         return f"""Eres el mejor manager de DJs de Funndication DJ Bookings, especializado en contratación de artistas.
 
-INFORMACIÓN DE DJS DISPONIBLES:
-{djs_database}
-
-PRECIOS Y REGLAS (EXACTAS):
-- The Brainkiller: 1.600€ base (Málaga), 1.800€ fuera Málaga, 2.500€ fuera España
-- Jose Rodriguez: 1.000€ base (Málaga), 1.200€ fuera Málaga, 1.900€ fuera España  
-- Tortu: 1.200€ base (Málaga), 1.400€ fuera Málaga, 2.100€ fuera España
-- V. Aparicio: 600€ base (Málaga), 800€ fuera Málaga, 1.500€ fuera España
-- Wardian: 600€ base (Málaga), 800€ fuera Málaga, 1.500€ fuera España
+{dj_context}
 
 REGLAS IMPORTANTES:
-- Caché base = 1 hora de trabajo
-- +300€ por cada hora adicional
-- Fuera de Málaga/España no incluye hotel, desplazamiento y comida
+{reglas_precios}
 - Todos los DJs están disponibles cualquier día del año
 - Número de cuenta: 78979566700116362718
 - Press kits: https://www.funndarkbookings/presskits.com
@@ -52,17 +134,15 @@ TAREAS:
 
 RESPONDE SIEMPRE EN ESPAÑOL y mantén un tono profesional pero cercano."""
 
-    def analyze_user_intent(self, message: str, djs_database: str) -> Dict:
-        """Analiza la intención del usuario usando OpenAI"""
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": f"""Analiza la intención del usuario en este mensaje sobre contratación de DJs.
+    def _intent_messages(self, message: str, djs_database: str) -> List[Dict]:
+        """Mensajes para el análisis de intención"""
+        return [
+            {
+                "role": "system", 
+                "content": f"""Analiza la intención del usuario en este mensaje sobre contratación de DJs.
 
-DJS DISPONIBLES: {djs_database}
+DJS DISPONIBLES:
+{self._get_selector(djs_database).select(message)}
 
 Devuelve un JSON con:
 {{
@@ -82,14 +162,18 @@ Ejemplos:
 - "cuanto cuesta The Brainkiller" -> intent: "info", entities: {{"dj_mentioned": "The Brainkiller"}}, suggested_response_type: "provide_info"
 - "hola" -> intent: "greeting", suggested_response_type: "greeting"
 """
-                    },
-                    {"role": "user", "content": message}
-                ],
+            },
+            {"role": "user", "content": message}
+        ]
+
+    def analyze_user_intent(self, message: str, djs_database: str) -> Dict:
+        """Analiza la intención del usuario usando OpenAI"""
+        try:
+            content = self._create_cached(
+                self._intent_messages(message, djs_database),
                 temperature=0.3,
                 max_tokens=300
             )
-            
-            content = response.choices[0].message.content
             return json.loads(content)
             
         except Exception as e:
@@ -97,64 +181,97 @@ Ejemplos:
             # Fallback a análisis simple
             return self._simple_intent_analysis(message)
     
-    def _simple_intent_analysis(self, message: str) -> Dict:
-        """Análisis de intención simple como fallback"""
-        message_lower = message.lower()
+    async def analyze_user_intent_async(self, message: str, djs_database: str) -> Dict:
+        """Versión asíncrona de analyze_user_intent"""
+        try:
+            content = await self._create_cached_async(
+                self._intent_messages(message, djs_database),
+                temperature=0.3,
+                max_tokens=300
+            )
+            return json.loads(content)
+            
+        except Exception as e:
+            print(f"Error analyzing intent: {e}")
+            return self._simple_intent_analysis(message)
+    
+    async def classify_intent_async(self, message: str, djs_database: str) -> Dict:
+        """Clasificación por niveles: local si es obvia, OpenAI si es ambigua"""
+        local = self._simple_intent_analysis(message)
+        if local["confidence"] >= self.intent_threshold:
+            self.intent_stats["local"] += 1
+            return local
         
-        booking_words = ["contratar", "booking", "book", "reservar", "precio", "cuanto", "tarifa"]
-        dj_names = ["brainkiller", "jose", "rodriguez", "tortu", "aparicio", "wardian"]
+        self.intent_stats["llm"] += 1
+        return await self.analyze_user_intent_async(message, djs_database)
+    
+    def _simple_intent_analysis(self, message: str) -> Dict:
+        """Análisis de intención local (fast-path y fallback si falla la API)"""
+        coincidencias = palabras_clave.buscar(message)
+        categorias = {coincidencia.categoria for coincidencia in coincidencias}
         
         intent = "other"
         confidence = 0.5
         suggested_response_type = "ask_clarification"
         
-        if any(word in message_lower for word in booking_words):
+        # Frases de reserva del prompt: intención clara
+        strong_booking = "contratar" in categorias
+        # Preguntas de precio: pueden ser reserva o consulta
+        weak_booking = bool(categorias & {"precio", "presupuesto"})
+        
+        if strong_booking:
             intent = "booking"
-            confidence = 0.8
+            confidence = 0.95
+            suggested_response_type = "show_djs"
+        elif weak_booking:
+            intent = "booking"
+            confidence = 0.6
             suggested_response_type = "show_djs"
         
-        dj_mentioned = None
-        for dj in dj_names:
-            if dj in message_lower:
-                if "brainkiller" in message_lower:
-                    dj_mentioned = "The Brainkiller"
-                elif "jose" in message_lower or "rodriguez" in message_lower:
-                    dj_mentioned = "Jose Rodriguez"
-                elif "tortu" in message_lower:
-                    dj_mentioned = "Tortu"
-                elif "aparicio" in message_lower:
-                    dj_mentioned = "V. Aparicio"
-                elif "wardian" in message_lower:
-                    dj_mentioned = "Wardian"
-                break
+        dj_mentioned = next((c.valor for c in coincidencias if c.categoria == "dj"), None)
+        if dj_mentioned is None:
+            dj_mentioned = artistas.resolver(message)
         
-        if dj_mentioned:
+        if dj_mentioned and not strong_booking:
             intent = "info"
+            # "cuánto cuesta Tortu" es una consulta clara; solo el nombre es ambiguo
+            confidence = 0.9 if weak_booking else 0.6
             suggested_response_type = "provide_info"
         
+        lugar = gazetteer.buscar(message)
+        
+        if (intent == "other" and len(message.split()) <= 4
+                and any(c.categoria == "saludo" and c.inicio == 0 for c in coincidencias)):
+            intent = "greeting"
+            confidence = 0.95
+            suggested_response_type = "greeting"
+        
         return {
             "intent": intent,
             "confidence": confidence,
             "entities": {
                 "dj_mentioned": dj_mentioned,
                 "event_type": None,
-                "location": None,
-                "budget_mentioned": "precio" in message_lower or "cuanto" in message_lower
+                "location": lugar.nombre if lugar else None,
+                "budget_mentioned": weak_booking
             },
-            "suggested_response_type": suggested_response_type
+            "suggested_response_type": suggested_response_type,
+            "source": "local"
         }
     
+    def _response_messages(self, message: str, context: str, djs_database: str) -> List[Dict]:
+        """Mensajes para generar una respuesta contextual"""
+        return [
+            {"role": "system", "content": self.get_system_prompt(self._get_selector(djs_database).select(message))},
+            {"role": "user", "content": f"Contexto: {context}\n\nUsuario dice: {message}"}
+        ]
+    
     def generate_response(self, message: str, context: str, djs_database: str) -> str:
         """Genera una respuesta contextual usando OpenAI"""
         try:
-            system_prompt = self.get_system_prompt(djs_database)
-            
             response = self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Contexto: {context}\n\nUsuario dice: {message}"}
-                ],
+                messages=self._response_messages(message, context, djs_database),
                 temperature=0.7,
                 max_tokens=800
             )
@@ -165,17 +282,60 @@ Ejemplos:
             print(f"Error generating response: {e}")
             return "Lo siento, tengo problemas técnicos. ¿Podrías repetir tu pregunta?"
     
-    def extract_dj_info(self, dj_name: str, djs_database: str) -> str:
-        """Extrae información específica de un DJ"""
+    async def generate_response_async(self, message: str, context: str, djs_database: str) -> str:
+        """Versión asíncrona de generate_response"""
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"""Extrae y formatea la información específica sobre {dj_name} de esta base de datos:
+            return await self._create_async(
+                self._response_messages(message, context, djs_database),
+                temperature=0.7,
+                max_tokens=800
+            )
+            
+        except Exception as e:
+            print(f"Error generating response: {e}")
+            return "Lo siento, tengo problemas técnicos. ¿Podrías repetir tu pregunta?"
+    
+    async def generate_response_stream(self, message: str, context: str, djs_database: str) -> AsyncIterator[str]:
+        """Versión en streaming de generate_response: devuelve los fragmentos según llegan"""
+        sent = False
+        try:
+            async with self._get_semaphore():
+                stream = await asyncio.wait_for(
+                    self.async_client.chat.completions.create(
+                        model=self.model,
+                        messages=self._response_messages(message, context, djs_database),
+                        temperature=0.7,
+                        max_tokens=800,
+                        stream=True
+                    ),
+                    timeout=self.timeout
+                )
+                # Timeout también entre fragmentos: un stream colgado no retiene la petición
+                chunks = stream.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+                    except StopAsyncIteration:
+                        break
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        sent = True
+                        yield chunk.choices[0].delta.content
+            
+        except Exception as e:
+            print(f"Error generating response: {e}")
+            if sent:
+                yield RESPUESTA_INTERRUMPIDA
+            else:
+                yield "Lo siento, tengo problemas técnicos. ¿Podrías repetir tu pregunta?"
+    
+    def _dj_info_messages(self, dj_name: str, djs_database: str) -> List[Dict]:
+        """Mensajes para extraer la información de un DJ"""
+        return [
+            {
+                "role": "system",
+                "content": f"""Extrae y formatea la información específica sobre {dj_name} de esta base de datos:
 
-{djs_database}
+{self._get_selector(djs_database).for_artist(dj_name)}
 
 Presenta la información de forma clara y atractiva, incluyendo:
 - Nombre y procedencia
@@ -186,34 +346,44 @@ Presenta la información de forma clara y atractiva, incluyendo:
 - Disponibilidad
 
 Mantén un tono profesional pero entusiasta."""
-                    },
-                    {"role": "user", "content": f"Dame información detallada sobre {dj_name}"}
-                ],
+            },
+            {"role": "user", "content": f"Dame información detallada sobre {dj_name}"}
+        ]
+    
+    def _dj_info_fallback(self, dj_name: str, djs_database: str) -> str:
+        """Ficha del DJ desde el catálogo cuando la API no responde"""
+        catalog = self.catalog or DJCatalog.from_text(djs_database)
+        dj = catalog.get(dj_name)
+        return dj.texto if dj else f"No encontré información específica sobre {dj_name}"
+    
+    def extract_dj_info(self, dj_name: str, djs_database: str) -> str:
+        """Extrae información específica de un DJ"""
+        try:
+            return self._create_cached(
+                self._dj_info_messages(dj_name, djs_database),
                 temperature=0.3,
-                max_tokens=500
+                max_tokens=500,
+                artist=dj_name
             )
             
-            return response.choices[0].message.content
-            
         except Exception as e:
             print(f"Error extracting DJ info: {e}")
             # Fallback a búsqueda simple en texto
-            lines = djs_database.split('\n')
-            dj_info = []
-            capture = False
-            
-            for line in lines:
-                if f"NOMBRE: {dj_name}" in line:
-                    capture = True
-                elif line.startswith("NOMBRE:") and capture:
-                    break
-                elif line.startswith("___") and capture:
-                    break
-                
-                if capture:
-                    dj_info.append(line.strip())
+            return self._dj_info_fallback(dj_name, djs_database)
+    
+    async def extract_dj_info_async(self, dj_name: str, djs_database: str) -> str:
+        """Versión asíncrona de extract_dj_info"""
+        try:
+            return await self._create_cached_async(
+                self._dj_info_messages(dj_name, djs_database),
+                temperature=0.3,
+                max_tokens=500,
+                artist=dj_name
+            )
             
-            return '\n'.join(dj_info) if dj_info else f"No encontré información específica sobre {dj_name}"
+        except Exception as e:
+            print(f"Error extracting DJ info: {e}")
+            return self._dj_info_fallback(dj_name, djs_database)
 
 # Instancia global
 openai_handler = OpenAIHandler() if os.getenv("OPENAI_API_KEY") else None
\ No newline at end of file
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Optional
+
+
+class PDFTextCache:
+    """Caché en SQLite del texto extraído de los PDFs.
+
+    Cada entrada se identifica por el hash SHA-256 del contenido del fichero.
+    La ruta, el mtime y el tamaño sirven de atajo: si no han cambiado desde la
+    última vez ni siquiera hace falta leer el fichero para calcular el hash.
+    """
+
+    def __init__(self, ruta_cache: str):
+        self.ruta_cache = ruta_cache
+        self.habilitada = bool(ruta_cache)
+        if self.habilitada:
+            try:
+                with self._conectar() as conn:
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS pdf_texto (
+                            sha256 TEXT PRIMARY KEY,
+                            texto TEXT NOT NULL
+                        )
+                    """)
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS pdf_fichero (
+                            ruta TEXT PRIMARY KEY,
+                            mtime_ns INTEGER NOT NULL,
+                            tamano INTEGER NOT NULL,
+                            sha256 TEXT NOT NULL
+                        )
+                    """)
+            except sqlite3.Error as e:
+                print(f"[WARNING] Caché de PDFs deshabilitada: {e}")
+                self.habilitada = False
+
+    @contextmanager
+    def _conectar(self):
+        """Conexión que hace commit al salir y se cierra siempre"""
+        conn = sqlite3.connect(self.ruta_cache)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _hash_fichero(ruta: str) -> str:
+        sha = hashlib.sha256()
+        with open(ruta, 'rb') as f:
+            for bloque in iter(lambda: f.read(1 << 20), b""):
+                sha.update(bloque)
+        return sha.hexdigest()
+
+    def get(self, ruta: str) -> Optional[str]:
+        """Texto cacheado del PDF, o None si no está o el fichero ha cambiado"""
+        if not self.habilitada:
+            return None
+        try:
+            ruta = os.path.abspath(ruta)
+            info = os.stat(ruta)
+            with self._conectar() as conn:
+                fila = conn.execute("""
+                    SELECT t.texto FROM pdf_fichero f JOIN pdf_texto t ON t.sha256 = f.sha256
+                    WHERE f.ruta = ? AND f.mtime_ns = ? AND f.tamano = ?
+                """, (ruta, info.st_mtime_ns, info.st_size)).fetchone()
+                if fila:
+                    return fila[0]
+
+                # El mtime ha cambiado (p. ej. tras un checkout): comprobar el contenido
+                sha256 = self._hash_fichero(ruta)
+                fila = conn.execute("SELECT texto FROM pdf_texto WHERE sha256 = ?", (sha256,)).fetchone()
+                if fila:
+                    self._registrar_fichero(conn, ruta, info, sha256)
+                    return fila[0]
+        except (OSError, sqlite3.Error) as e:
+            print(f"[WARNING] Error leyendo la caché de PDFs: {e}")
+        return None
+
+    def put(self, ruta: str, texto: str) -> None:
+        """Guarda el texto extraído de un PDF"""
+        if not self.habilitada:
+            return
+        try:
+            ruta = os.path.abspath(ruta)
+            info = os.stat(ruta)
+            sha256 = self._hash_fichero(ruta)
+            with self._conectar() as conn:
+                conn.execute("INSERT OR REPLACE INTO pdf_texto (sha256, texto) VALUES (?, ?)", (sha256, texto))
+                self._registrar_fichero(conn, ruta, info, sha256)
+        except (OSError, sqlite3.Error) as e:
+            print(f"[WARNING] Error escribiendo la caché de PDFs: {e}")
+
+    @staticmethod
+    def _registrar_fichero(conn: sqlite3.Connection, ruta: str, info: os.stat_result, sha256: str) -> None:
+        conn.execute("""
+            INSERT OR REPLACE INTO pdf_fichero (ruta, mtime_ns, tamano, sha256)
+            VALUES (?, ?, ?, ?)
+        """, (ruta, info.st_mtime_ns, info.st_size, sha256))
@@ -0,0 +1,215 @@
+import math
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from catalog import DJCatalog, normalizar
+from gazetteer import gazetteer
+
+# Tramos de precio del PDF de datos, en el orden de la tabla de tarifas
+ZONAS = ("base", "fuera_malaga", "fuera_espana")
+NOMBRES_ZONAS = {"base": "Málaga", "fuera_malaga": "fuera de Málaga", "fuera_espana": "fuera de España"}
+
+# Reglas generales del PDF (se usan si la ficha de un artista no las indica)
+HORAS_BASE = 1
+PRECIO_HORA_EXTRA = 300
+
+# DJ cuyo caché se aplica cuando el nombre no está en el catálogo
+DJ_POR_DEFECTO = "V. Aparicio"
+
+
+def clasificar_localizacion(localizacion: str) -> str:
+    """Tramo de precio (una de ZONAS) para la localización del evento.
+
+    Los lugares no reconocidos se cobran como fuera de Málaga.
+    """
+    return gazetteer.zona(localizacion, por_defecto="fuera_malaga")
+
+
+# Tope de horas por actuación: evita que un texto mal leído dispare las horas extra
+HORAS_MAXIMAS = 12
+
+_UNIDAD_HORAS = r"(?:h|hr|hrs|hora|horas)"
+
+# Duración con cualquiera de sus abreviaturas ('4h', '4 hrs', '1,5 horas', '1:30 horas').
+# No vale un número pegado a ':', '.' u otra cifra (los minutos de '1:30 horas')
+PATRON_HORAS = re.compile(
+    r"(?<![\d:.])(\d{1,2}:\d{2}|\d+(?:[.,]\d+)?)\s*" + _UNIDAD_HORAS + r"\b(\s+y\s+media\b)?"
+)
+
+# Horario 'de 23h a 2h', 'de las 22:00 a las 02:00' (puede pasar de medianoche)
+_RANGO_HORARIO = re.compile(
+    r"\bde\s+(?:las\s+)?(\d{1,2})(?:[:.](\d{2}))?\s*(" + _UNIDAD_HORAS + r")?"
+    r"\s+a\s+(?:las\s+)?(\d{1,2})(?:[:.](\d{2}))?\s*" + _UNIDAD_HORAS + r"?\b"
+)
+
+
+def _acotar_horas(horas: float) -> int:
+    """Horas empezadas, entre 1 y HORAS_MAXIMAS"""
+    return min(max(math.ceil(horas), 1), HORAS_MAXIMAS)
+
+
+def buscar_horas(texto: str) -> Optional[int]:
+    """Horas de actuación indicadas en el texto, o None si no indica ninguna.
+
+    Acepta '3 horas', '4h', '1,5 horas', '1:30 horas' y '2 horas y media' (las fracciones cuentan
+    como hora empezada) y horarios 'de 23h a 2h'. 'de 2 a 3 horas' no es un
+    horario sino una duración: se toma la mayor.
+    """
+    texto = texto.lower()
+    for rango in _RANGO_HORARIO.finditer(texto):
+        hora_inicio, minutos_inicio, unidad, hora_fin, minutos_fin = rango.groups()
+        # Solo es un horario si la primera hora lleva unidad o alguna lleva minutos
+        if not (unidad or minutos_inicio or minutos_fin):
+            continue
+        inicio = int(hora_inicio) + int(minutos_inicio or 0) / 60
+        fin = int(hora_fin) + int(minutos_fin or 0) / 60
+        if inicio > 24 or fin > 24:
+            continue
+        duracion = (fin - inicio) % 24
+        if duracion:
+            return _acotar_horas(duracion)
+    encontrada = PATRON_HORAS.search(texto)
+    if encontrada:
+        valor, media = encontrada.groups()
+        if ":" in valor:
+            horas, minutos = valor.split(":")
+            horas = int(horas) + int(minutos) / 60
+        else:
+            horas = float(valor.replace(",", "."))
+        return _acotar_horas(horas + (0.5 if media else 0))
+    return None
+
+
+def parsear_horas(duracion: str) -> int:
+    """Horas de actuación a partir del texto ('3 horas', '4h' -> 3, 4); 1 si no se indica"""
+    horas = buscar_horas(duracion)
+    if horas:
+        return horas
+    texto = duracion.lower()
+    if "hora" in texto:
+        # 'horas: 3', 'duración en horas 3'
+        numero = re.search(r"(?<![\d:.])\d+(?![\d:.])", texto)
+        if numero:
+            return _acotar_horas(int(numero.group()))
+    return HORAS_BASE
+
+
+@dataclass(frozen=True)
+class Quote:
+    """Presupuesto de un DJ para una localización y duración"""
+    dj: str
+    zona: str
+    horas: int
+    precio_base: int
+    horas_extra: int
+    precio_hora_extra: int
+
+    @property
+    def precio_horas_extra(self) -> int:
+        return self.horas_extra * self.precio_hora_extra
+
+    @property
+    def total(self) -> int:
+        return self.precio_base + self.precio_horas_extra
+
+    def desglose(self) -> List[str]:
+        """Líneas del desglose tal y como se muestran al cliente"""
+        if self.zona == "base":
+            lineas = [f"Caché base {self.dj} (Málaga): {self.precio_base}€"]
+        elif self.zona == "fuera_espana":
+            lineas = [f"Caché {self.dj} fuera de España: {self.precio_base}€",
+                      "(No incluido hotel, desplazamiento y comida)"]
+        else:
+            lineas = [f"Caché {self.dj} fuera de Málaga: {self.precio_base}€",
+                      "(No incluido hotel, desplazamiento y comida)"]
+        if self.horas_extra > 0:
+            lineas.append(f"Horas adicionales ({self.horas_extra}h x {self.precio_hora_extra}€): "
+                          f"+{self.precio_horas_extra}€")
+        return lineas
+
+    def to_dict(self) -> Dict:
+        return {
+            "dj": self.dj,
+            "zona": self.zona,
+            "horas": self.horas,
+            "precio_base": self.precio_base,
+            "horas_extra": self.horas_extra,
+            "precio_horas_extra": self.precio_horas_extra,
+            "total": self.total,
+        }
+
+
+class PricingEngine:
+    """Tarifas de todos los DJs, construidas una vez a partir del catálogo.
+
+    Cada artista queda como una fila (base, fuera_malaga, fuera_espana,
+    horas_base, precio_hora_extra), así que un presupuesto es una búsqueda en
+    la tabla y unas pocas sumas. quote está cacheado; quote_all clasifica la
+    localización y la duración una sola vez para todos los DJs.
+    """
+
+    def __init__(self, tarifas: Dict[str, Tuple[str, Tuple[int, int, int], int, int]],
+                 por_defecto: str = DJ_POR_DEFECTO):
+        # clave normalizada -> (nombre, precios por zona, horas base, precio hora extra)
+        self.tarifas = tarifas
+        self.por_defecto = normalizar(por_defecto)
+        self._cotizar = lru_cache(maxsize=1024)(self._calcular)
+
+    @classmethod
+    def from_catalog(cls, catalog: DJCatalog, por_defecto: str = DJ_POR_DEFECTO) -> "PricingEngine":
+        tarifas = {}
+        for artista in catalog:
+            if not all(zona in artista.precios for zona in ZONAS):
+                continue
+            tarifas[artista.clave] = (
+                artista.nombre,
+                tuple(artista.precios[zona] for zona in ZONAS),
+                artista.horas_base or HORAS_BASE,
+                artista.precio_hora_extra or PRECIO_HORA_EXTRA,
+            )
+        return cls(tarifas, por_defecto)
+
+    def _tarifa(self, dj: str):
+        return self.tarifas.get(normalizar(dj)) or self.tarifas.get(self.por_defecto)
+
+    def _calcular(self, dj: str, zona: str, horas: int) -> Optional[Quote]:
+        tarifa = self._tarifa(dj)
+        if tarifa is None:
+            return None
+        _, precios, horas_base, precio_hora_extra = tarifa
+        return Quote(dj, zona, horas, precios[ZONAS.index(zona)], max(horas - horas_base, 0), precio_hora_extra)
+
+    def quote(self, dj: str, localizacion: str, duracion: str) -> Optional[Quote]:
+        """Presupuesto de un DJ (con el caché del DJ por defecto si no está en el catálogo)"""
+        return self._cotizar(dj, clasificar_localizacion(localizacion), parsear_horas(duracion))
+
+    def quote_all(self, localizacion: str, duracion: str, djs: Optional[Iterable[str]] = None) -> List[Quote]:
+        """Presupuestos de varios DJs (todos si djs es None) para el mismo evento"""
+        zona = clasificar_localizacion(localizacion)
+        horas = parsear_horas(duracion)
+        nombres = [tarifa[0] for tarifa in self.tarifas.values()] if djs is None else djs
+        return [cotizacion for cotizacion in (self._cotizar(dj, zona, horas) for dj in nombres) if cotizacion]
+
+    def tabla(self, zona: str) -> Dict[str, int]:
+        """Caché de cada DJ en un tramo"""
+        indice = ZONAS.index(zona)
+        return {nombre: precios[indice] for nombre, precios, _, _ in self.tarifas.values()}
+
+    def reglas(self) -> List[str]:
+        """Reglas de precio para el prompt, derivadas de las tarifas"""
+        horas_base = {tarifa[2] for tarifa in self.tarifas.values()} or {HORAS_BASE}
+        extras = {tarifa[3] for tarifa in self.tarifas.values()} or {PRECIO_HORA_EXTRA}
+        lineas = []
+        if len(horas_base) == 1:
+            horas = horas_base.pop()
+            lineas.append(f"- Caché base = {horas} hora{'s' if horas != 1 else ''} de trabajo")
+        else:
+            lineas.append("- Caché base = horas indicadas en la ficha de cada DJ")
+        if len(extras) == 1:
+            lineas.append(f"- +{extras.pop()}€ por cada hora adicional")
+        else:
+            lineas.append("- Cada hora adicional se cobra según la ficha de cada DJ")
+        lineas.append("- Fuera de Málaga/España no incluye hotel, desplazamiento y comida")
+        return lineas
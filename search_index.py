@@ -0,0 +1,70 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+from catalog import normalizar
+
+_PALABRA = re.compile(r"\w+")
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Tokens normalizados (sin acentos, minúsculas, plural simple eliminado)"""
+    tokens = []
+    for token in _PALABRA.findall(normalizar(texto)):
+        if len(token) > 4 and token.endswith("s"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """Índice invertido con puntuación BM25 sobre una lista de pasajes"""
+
+    def __init__(self, pasajes: List[str], k1: float = 1.5, b: float = 0.75):
+        self.pasajes = pasajes
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.longitudes: List[int] = []
+
+        for doc_id, pasaje in enumerate(pasajes):
+            tokens = tokenizar(pasaje)
+            self.longitudes.append(len(tokens))
+            for token, frecuencia in Counter(tokens).items():
+                self.postings[token].append((doc_id, frecuencia))
+
+        self.longitud_media = (sum(self.longitudes) / len(self.longitudes)) if self.longitudes else 0.0
+        total = len(pasajes)
+        self.idf = {
+            token: math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for token, docs in self.postings.items()
+        }
+
+    def puntuar(self, consulta: str, min_longitud: int = 3) -> Dict[int, float]:
+        """Puntuación BM25 de cada pasaje que contiene algún término de la consulta"""
+        puntuaciones: Dict[int, float] = defaultdict(float)
+        for token in set(tokenizar(consulta)):
+            if len(token) < min_longitud or token not in self.postings:
+                continue
+            idf = self.idf[token]
+            for doc_id, frecuencia in self.postings[token]:
+                norma = self.k1 * (1 - self.b + self.b * self.longitudes[doc_id] / self.longitud_media)
+                puntuaciones[doc_id] += idf * frecuencia * (self.k1 + 1) / (frecuencia + norma)
+        return puntuaciones
+
+    def buscar(self, consulta: str, k: int = 3) -> List[str]:
+        """Los k pasajes más relevantes (a igual puntuación, en orden de aparición)"""
+        puntuaciones = self.puntuar(consulta)
+        mejores = sorted(puntuaciones.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [self.pasajes[doc_id] for doc_id, _ in mejores]
+
+
+class SentenceIndex(BM25Index):
+    """Índice de oraciones de un texto, construido una vez al cargar los datos"""
+
+    @classmethod
+    def from_text(cls, texto: str) -> "SentenceIndex":
+        oraciones = texto.replace('\n', ' ').split('.')
+        oraciones = [o.strip() for o in oraciones if len(o.strip()) > 10]
+        return cls(oraciones)
@@ -0,0 +1,308 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Serialización compacta: claves cortas para los campos conocidos de la sesión
+CLAVES_SESION = {"estado": "e", "dj_seleccionado": "d", "datos_evento": "x", "campo_pendiente": "p"}
+CLAVES_DATOS = {
+    "localizacion": "l", "fecha": "f", "duracion": "d",
+    "nombre": "n", "telefono": "t", "email": "m",
+}
+ESTADOS = {"inicial": "i", "seleccionando_dj": "s", "recopilando_datos": "r", "finalizado": "f"}
+
+
+def _invertir(mapa: Dict[str, str]) -> Dict[str, str]:
+    return {corta: larga for larga, corta in mapa.items()}
+
+
+_CLAVES_SESION_INV = _invertir(CLAVES_SESION)
+_CLAVES_DATOS_INV = _invertir(CLAVES_DATOS)
+_ESTADOS_INV = _invertir(ESTADOS)
+
+
+def serializar_sesion(session: Dict) -> str:
+    """JSON compacto de la sesión (claves y estados abreviados)"""
+    compacta = {}
+    for clave, valor in session.items():
+        if clave == "estado":
+            valor = ESTADOS.get(valor, valor)
+        elif clave == "datos_evento":
+            valor = {CLAVES_DATOS.get(k, k): v for k, v in valor.items()}
+        compacta[CLAVES_SESION.get(clave, clave)] = valor
+    return json.dumps(compacta, ensure_ascii=False, separators=(",", ":"))
+
+
+def deserializar_sesion(texto: str) -> Dict:
+    session = {}
+    for clave, valor in json.loads(texto).items():
+        clave = _CLAVES_SESION_INV.get(clave, clave)
+        if clave == "estado":
+            valor = _ESTADOS_INV.get(valor, valor)
+        elif clave == "datos_evento":
+            valor = {_CLAVES_DATOS_INV.get(k, k): v for k, v in valor.items()}
+        session[clave] = valor
+    return session
+
+
+def shard_for(session_id: str, shards: int) -> int:
+    """Partición estable de una sesión (igual en todos los workers y reinicios)"""
+    return zlib.crc32(session_id.encode("utf-8")) % shards if shards > 1 else 0
+
+
+class SessionStore(ABC):
+    """Almacén de sesiones de chat con caducidad por inactividad y tamaño máximo.
+
+    Los métodos *_async son los que usan los handlers: en los almacenes que
+    hacen E/S (bloqueante = True) llevan la operación a un hilo del executor.
+    """
+
+    bloqueante = False
+
+    def __init__(self, ttl: float = 1800, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.evictions = {"ttl": 0, "lru": 0}
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def set(self, session_id: str, session: Dict) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Elimina las sesiones caducadas; devuelve cuántas se han eliminado"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    async def _ejecutar(self, funcion, *args):
+        if not self.bloqueante:
+            return funcion(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, funcion, *args)
+
+    async def get_async(self, session_id: str) -> Optional[Dict]:
+        return await self._ejecutar(self.get, session_id)
+
+    async def set_async(self, session_id: str, session: Dict) -> None:
+        await self._ejecutar(self.set, session_id, session)
+
+    async def delete_async(self, session_id: str) -> None:
+        await self._ejecutar(self.delete, session_id)
+
+    async def metrics_async(self) -> Dict:
+        return await self._ejecutar(self.metrics)
+
+    def metrics(self) -> Dict:
+        return {
+            "backend": type(self).__name__,
+            "live": len(self),
+            "evicted_ttl": self.evictions["ttl"],
+            "evicted_lru": self.evictions["lru"],
+        }
+
+
+class MemorySessionStore(SessionStore):
+    """Sesiones en memoria del proceso (LRU + TTL)"""
+
+    def __init__(self, ttl: float = 1800, max_size: int = 10000):
+        super().__init__(ttl, max_size)
+        self._sesiones: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        ahora = time.time()
+        with self._lock:
+            entrada = self._sesiones.get(session_id)
+            if entrada is None:
+                return None
+            ultimo_acceso, session = entrada
+            if ahora - ultimo_acceso > self.ttl:
+                del self._sesiones[session_id]
+                self.evictions["ttl"] += 1
+                return None
+            self._sesiones[session_id] = (ahora, session)
+            self._sesiones.move_to_end(session_id)
+            return session
+
+    def set(self, session_id: str, session: Dict) -> None:
+        with self._lock:
+            self._sesiones[session_id] = (time.time(), session)
+            self._sesiones.move_to_end(session_id)
+            while len(self._sesiones) > self.max_size:
+                self._sesiones.popitem(last=False)
+                self.evictions["lru"] += 1
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sesiones.pop(session_id, None)
+
+    def sweep(self) -> int:
+        limite = time.time() - self.ttl
+        eliminadas = 0
+        with self._lock:
+            # Orden LRU: las más antiguas están al principio
+            while self._sesiones:
+                session_id, (ultimo_acceso, _) = next(iter(self._sesiones.items()))
+                if ultimo_acceso > limite:
+                    break
+                del self._sesiones[session_id]
+                eliminadas += 1
+            self.evictions["ttl"] += eliminadas
+        return eliminadas
+
+    def __len__(self) -> int:
+        return len(self._sesiones)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sesiones en un fichero SQLite (sobreviven a reinicios del proceso).
+
+    Usa modo WAL para que varios workers de uvicorn compartan el mismo
+    fichero sin bloquear las lecturas. El tope de tamaño se aplica en cada
+    barrido, no en cada escritura.
+    """
+
+    bloqueante = True
+
+    def __init__(self, path: str, ttl: float = 1800, max_size: int = 10000):
+        super().__init__(ttl, max_size)
+        self.path = path
+        with self._conectar() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sesiones (
+                    id TEXT PRIMARY KEY,
+                    datos TEXT NOT NULL,
+                    ultimo_acceso REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sesiones_acceso ON sesiones(ultimo_acceso)")
+
+    @contextmanager
+    def _conectar(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        ahora = time.time()
+        with self._conectar() as conn:
+            fila = conn.execute(
+                "SELECT datos, ultimo_acceso FROM sesiones WHERE id = ?", (session_id,)
+            ).fetchone()
+            if fila is None:
+                return None
+            if ahora - fila[1] > self.ttl:
+                conn.execute("DELETE FROM sesiones WHERE id = ?", (session_id,))
+                self.evictions["ttl"] += 1
+                return None
+            conn.execute("UPDATE sesiones SET ultimo_acceso = ? WHERE id = ?", (ahora, session_id))
+        return deserializar_sesion(fila[0])
+
+    def set(self, session_id: str, session: Dict) -> None:
+        with self._conectar() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sesiones (id, datos, ultimo_acceso) VALUES (?, ?, ?)",
+                (session_id, serializar_sesion(session), time.time())
+            )
+
+    def delete(self, session_id: str) -> None:
+        with self._conectar() as conn:
+            conn.execute("DELETE FROM sesiones WHERE id = ?", (session_id,))
+
+    def sweep(self) -> int:
+        with self._conectar() as conn:
+            caducadas = conn.execute(
+                "DELETE FROM sesiones WHERE ultimo_acceso < ?", (time.time() - self.ttl,)
+            ).rowcount
+            # Por encima del tamaño máximo se eliminan las de acceso más antiguo
+            sobrantes = conn.execute("""
+                DELETE FROM sesiones WHERE id IN (
+                    SELECT id FROM sesiones ORDER BY ultimo_acceso DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_size,)).rowcount
+        self.evictions["ttl"] += caducadas
+        self.evictions["lru"] += sobrantes
+        return caducadas + sobrantes
+
+    def __len__(self) -> int:
+        with self._conectar() as conn:
+            return conn.execute("SELECT COUNT(*) FROM sesiones").fetchone()[0]
+
+
+class ShardedSessionStore(SessionStore):
+    """Reparte las sesiones entre varios almacenes por hash del session_id.
+
+    Con SQLite cada partición es un fichero distinto, así que las escrituras
+    de sesiones diferentes no compiten por el mismo bloqueo.
+    """
+
+    def __init__(self, stores: List[SessionStore]):
+        super().__init__(stores[0].ttl, sum(store.max_size for store in stores))
+        self.stores = stores
+        self.bloqueante = any(store.bloqueante for store in stores)
+
+    def _store(self, session_id: str) -> SessionStore:
+        return self.stores[shard_for(session_id, len(self.stores))]
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        return self._store(session_id).get(session_id)
+
+    def set(self, session_id: str, session: Dict) -> None:
+        self._store(session_id).set(session_id, session)
+
+    def delete(self, session_id: str) -> None:
+        self._store(session_id).delete(session_id)
+
+    def sweep(self) -> int:
+        return sum(store.sweep() for store in self.stores)
+
+    def __len__(self) -> int:
+        return sum(len(store) for store in self.stores)
+
+    def metrics(self) -> Dict:
+        metrics = super().metrics()
+        metrics["shards"] = len(self.stores)
+        metrics["evicted_ttl"] = sum(store.evictions["ttl"] for store in self.stores)
+        metrics["evicted_lru"] = sum(store.evictions["lru"] for store in self.stores)
+        return metrics
+
+
+def create_session_store() -> SessionStore:
+    """Crea el almacén de sesiones según SESSION_BACKEND (memory | sqlite)"""
+    ttl = float(os.getenv("SESSION_TTL", "1800"))
+    max_size = int(os.getenv("SESSION_MAX", "10000"))
+    backend = os.getenv("SESSION_BACKEND", "memory").lower()
+    shards = int(os.getenv("SESSION_SHARDS", "1"))
+
+    if backend == "sqlite":
+        path = os.getenv("SESSION_DB_PATH", "sesiones.db")
+        if shards <= 1:
+            return SQLiteSessionStore(path, ttl, max_size)
+        base, extension = os.path.splitext(path)
+        return ShardedSessionStore([
+            SQLiteSessionStore(f"{base}-{i}{extension}", ttl, max_size // shards)
+            for i in range(shards)
+        ])
+    return MemorySessionStore(ttl, max_size)
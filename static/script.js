@@ -60,8 +60,8 @@ class ChatInterface {
             // Show loading
             this.showLoading(true);
             
-            // Send request to API
-            const response = await fetch('/chat', {
+            // Send request to the streaming API
+            const response = await fetch('/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -72,17 +72,12 @@ class ChatInterface {
                 })
             });
             
-            if (!response.ok) {
+            if (!response.ok || !response.body) {
                 throw new Error(`Request failed with status ${response.status}`);
             }
             
-            const data = await response.json();
-            
-            // Update session ID
-            this.sessionId = data.session_id;
-            
-            // Add assistant response
-            this.addMessage(data.response, 'assistant');
+            // Render the assistant response as it arrives
+            const data = await this.readStream(response);
             
             // Handle conversation end
             if (data.status === 'completed') {
@@ -103,6 +98,61 @@ class ChatInterface {
         }
     }
     
+    async readStream(response) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        const result = { status: 'active' };
+        let buffer = '';
+        let content = '';
+        let contentDiv = null;
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffer += decoder.decode(value, { stream: true });
+            
+            // Server-Sent Events are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const { event, data } = this.parseEvent(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+                
+                if (event === 'session' || event === 'done') {
+                    Object.assign(result, data);
+                    this.sessionId = data.session_id;
+                } else if (data.delta) {
+                    if (!contentDiv) {
+                        // First chunk: hide the spinner and open the message bubble
+                        this.showLoading(false);
+                        contentDiv = this.addMessage('', 'assistant');
+                    }
+                    content += data.delta;
+                    contentDiv.innerHTML = this.formatAssistantMessage(content);
+                    this.scrollToBottom();
+                }
+            }
+        }
+        
+        return result;
+    }
+    
+    parseEvent(rawEvent) {
+        let event = 'message';
+        const dataLines = [];
+        
+        rawEvent.split('\n').forEach((line) => {
+            if (line.startsWith('event:')) {
+                event = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                dataLines.push(line.slice(5).trim());
+            }
+        });
+        
+        return { event, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : {} };
+    }
+    
     addMessage(content, sender) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${sender}-message`;
@@ -137,6 +187,8 @@ class ChatInterface {
         
         this.messagesContainer.appendChild(messageDiv);
         this.scrollToBottom();
+        
+        return contentDiv;
     }
     
     formatAssistantMessage(content) {
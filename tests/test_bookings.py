@@ -0,0 +1,88 @@
+import datetime
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from bookings_repository import BookingRepository
+from db import ConnectionManager
+
+ESQUEMA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "contrataciones.sql")
+FECHA = (datetime.date.today() + datetime.timedelta(days=30)).isoformat()
+
+
+def datos_evento(fecha=FECHA):
+    return {"localizacion": "Marbella", "fecha": fecha, "duracion": "3 horas",
+            "nombre": "Ana", "telefono": "600000000", "email": "ana@example.com"}
+
+
+def abrir(path):
+    """Repositorio con su propia conexión, como otro worker sobre la misma base de datos"""
+    repositorio = BookingRepository(ConnectionManager(path))
+    with open(ESQUEMA, encoding="utf-8") as f:
+        repositorio.db.connection().executescript(f.read())
+    repositorio.cargar_calendario()
+    return repositorio
+
+
+@pytest.fixture
+def ruta(tmp_path):
+    return str(tmp_path / "contrataciones.db")
+
+
+@pytest.fixture
+def repositorio(ruta):
+    repositorio = abrir(ruta)
+    yield repositorio
+    repositorio.close()
+
+
+def confirmadas(repositorio):
+    return repositorio.db.connection().execute(
+        "SELECT COUNT(*) FROM contrataciones WHERE estado = 'confirmada'"
+    ).fetchone()[0]
+
+
+def test_reservas_simultaneas_solo_gana_una(ruta):
+    repositorios = [abrir(ruta) for _ in range(4)]
+    barrera = threading.Barrier(8)
+
+    def reservar(indice):
+        barrera.wait()
+        return repositorios[indice % 4].guardar("Tortu", datos_evento(), 1200)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        resultados = list(pool.map(reservar, range(8)))
+    assert resultados.count(True) == 1
+    assert confirmadas(repositorios[0]) == 1
+    for repositorio in repositorios:
+        repositorio.close()
+
+
+def test_mismo_dj_con_y_sin_acentos(repositorio):
+    assert repositorio.guardar("Jose Rodríguez", datos_evento(), 1000)
+    assert not repositorio.guardar("Jose Rodriguez", datos_evento(), 1000)
+    assert not repositorio.guardar("JOSE RODRIGUEZ", datos_evento(), 1000)
+    assert confirmadas(repositorio) == 1
+    # También sin calendario en memoria, consultando SQLite
+    repositorio.calendario = None
+    assert not repositorio.disponible("jose rodriguez", FECHA)
+
+
+def test_cancelacion_libera_el_dia_en_otro_proceso(ruta, repositorio):
+    otro = abrir(ruta)
+    try:
+        assert repositorio.guardar("Tortu", datos_evento(), 1200)
+        assert not otro.disponible("Tortu", FECHA)
+
+        with repositorio.db.transaction() as conn:
+            conn.execute("UPDATE contrataciones SET estado = 'cancelada' WHERE fecha_iso = ?", (FECHA,))
+        assert otro.disponible("Tortu", FECHA)
+        assert otro.libres(FECHA, ["Tortu", "Wardian"]) == ["Tortu", "Wardian"]
+
+        # Y la fecha se puede volver a contratar
+        assert otro.guardar("Tortu", datos_evento(), 1200)
+        assert not repositorio.disponible("Tortu", FECHA)
+    finally:
+        otro.close()
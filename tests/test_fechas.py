@@ -0,0 +1,32 @@
+import datetime
+
+import pytest
+
+from fechas import normalizar_fecha, parsear_fecha
+
+HOY = datetime.date(2026, 10, 16)
+
+
+@pytest.mark.parametrize("texto, esperada", [
+    # Fecha seguida de una hora: la hora no se lee como día.mes
+    ("14 de junio a las 22.30", datetime.date(2027, 6, 14)),
+    ("14 de junio de 2027 a las 23.00", datetime.date(2027, 6, 14)),
+    ("14/06 a las 23.00", datetime.date(2027, 6, 14)),
+    ("25/12 a las 10.05", datetime.date(2026, 12, 25)),
+    ("a las 10.05 el 25/12", datetime.date(2026, 12, 25)),
+    ("2027-06-14 a las 23.00", datetime.date(2027, 6, 14)),
+    ("mañana a las 22.30", datetime.date(2026, 10, 17)),
+    # Formatos sin hora
+    ("25.12.2027", datetime.date(2027, 12, 25)),
+    ("14.06", datetime.date(2027, 6, 14)),
+    ("25 de diciembre por la mañana", datetime.date(2026, 12, 25)),
+    ("31/02", None),
+    ("a las 22.30h", None),
+])
+def test_parsear_fecha(texto, esperada):
+    assert parsear_fecha(texto, HOY) == esperada
+
+
+def test_fecha_con_hora_se_normaliza():
+    # Sin fecha_iso la contratación quedaría fuera del índice único y del calendario
+    assert normalizar_fecha("14 de junio de 2027 a las 23.00", HOY) == "2027-06-14"
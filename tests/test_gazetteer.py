@@ -0,0 +1,48 @@
+import pytest
+
+from gazetteer import gazetteer
+from pricing import clasificar_localizacion
+
+
+@pytest.mark.parametrize("texto, zona", [
+    # Las direcciones acaban en la ciudad: manda el último lugar
+    ("Ronda de Outeiro, A Coruña", "fuera_malaga"),
+    ("Calle Alameda 3, Sevilla", "fuera_malaga"),
+    ("Hotel Faro, Marbella", "base"),
+    ("Discoteca Paris, Madrid", "fuera_malaga"),
+    ("Boda en Ronda", "base"),
+    ("Serranía de Ronda", "base"),
+    ("Santiago de Chile", "fuera_espana"),
+    ("fuera de Málaga", "fuera_malaga"),
+    ("Festival en Londres, UK", "fuera_espana"),
+    ("Gira por USA", "fuera_espana"),
+    # Un país, una comunidad o una comarca no sustituye al municipio que va antes
+    ("Marbella, Málaga, España", "base"),
+    ("Málaga, Spain", "base"),
+    ("Málaga, Andalucía", "base"),
+    ("Marbella (Spain)", "base"),
+    ("Estepona, Costa del Sol, Spain", "base"),
+    ("Sevilla, España", "fuera_malaga"),
+    ("Lisboa, Portugal", "fuera_espana"),
+])
+def test_zona_de_direcciones(texto, zona):
+    assert clasificar_localizacion(texto) == zona
+
+
+@pytest.mark.parametrize("texto", [
+    "¿cuánto cobra Tortu si usa su equipo 3 horas?",
+    "Ronda de Outeiro",
+    "Calle Alameda 3",
+    "Hotel Faro",
+])
+def test_sin_lugar(texto):
+    assert gazetteer.buscar(texto) is None
+
+
+def test_lugares_en_orden():
+    assert [lugar.nombre for lugar in gazetteer.lugares("De Vélez-Málaga a Lisboa")] == ["Vélez-Málaga", "Lisboa"]
+
+
+def test_el_municipio_gana_al_pais():
+    assert gazetteer.buscar("Estepona, Costa del Sol, Spain").nombre == "Estepona"
+    assert gazetteer.buscar("Costa del Sol, Spain").nombre == "Costa del Sol"
@@ -0,0 +1,45 @@
+import pytest
+
+from pricing import HORAS_BASE, HORAS_MAXIMAS, PricingEngine, buscar_horas, parsear_horas
+
+
+@pytest.mark.parametrize("texto, horas", [
+    ("3 horas", 3),
+    ("4h", 4),
+    ("4 hrs", 4),
+    ("2hr", 2),
+    ("1 hora", 1),
+    ("horas: 5", 5),
+    # Fracciones: se cobra la hora empezada, nunca los minutos como horas
+    ("1:30 horas", 2),
+    ("1,5 horas", 2),
+    ("1.5h", 2),
+    ("2 horas y media", 3),
+    ("a las 22.30 durante 3 horas", 3),
+    # Horarios, también pasada la medianoche
+    ("de 23h a 2h", 3),
+    ("de 20h a 23h", 3),
+    ("de las 22:00 a las 02:00", 4),
+    ("de 22.30 a 2.00", 4),
+    # Un intervalo de duraciones no es un horario
+    ("de 2 a 3 horas", 3),
+    # Tope de horas y valores sin sentido
+    ("100 horas", HORAS_MAXIMAS),
+    ("0 horas", 1),
+    ("", HORAS_BASE),
+    ("toda la noche", HORAS_BASE),
+])
+def test_parsear_horas(texto, horas):
+    assert parsear_horas(texto) == horas
+
+
+def test_buscar_horas_sin_duracion():
+    assert buscar_horas("el 14 de junio a las 22.30") is None
+
+
+def test_horario_no_dispara_las_horas_extra():
+    motor = PricingEngine({"tortu": ("Tortu", (1200, 1400, 1800), 1, 300)})
+    presupuesto = motor.quote("Tortu", "Málaga", "de 23h a 2h")
+    assert presupuesto.horas == 3
+    assert presupuesto.horas_extra == 2
+    assert presupuesto.total == 1200 + 2 * 300